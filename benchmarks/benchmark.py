@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Offline benchmark of exchange2org using the fake Exchange backend of
+fakeexchange.py.
+
+For each number of synthetic events and each number of processes of
+--render-workers, the phases fetch, convert and write of Exchange2Org
+are timed. Results contain events per second, time per phase and peak
+memory per phase and can be saved as JSON in order to compare them
+between versions. The speedup of the convert phase is reported relative
+to the first number of processes, whose output has to be identical.
+
+Example usages:
+  benchmarks/benchmark.py --sizes 1000,10000 --json before.json
+  benchmarks/benchmark.py --sizes 1000,10000 --compare before.json
+  benchmarks/benchmark.py --sizes 100000 --render-workers 1,2,4,8
+  benchmarks/benchmark.py --latency 50 -- --fetch-window month
+      … arguments after "--" are passed to exchange2org.
+"""
+
+import argparse
+import datetime
+import hashlib
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import exchange2org  # noqa: E402
+import fakeexchange  # noqa: E402
+
+PHASES = ['fetch', 'convert', 'write']
+
+TEMPLATE_CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                               'exchange2org', 'exchange2orgconfig-TEMPLATE.py')
+
+
+def load_template_config():
+    """
+    Returns the configuration template as a module.
+    """
+    import importlib.util
+    spec = importlib.util.spec_from_file_location('exchange2orgconfig', TEMPLATE_CONFIG)
+    config = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(config)
+    return config
+
+
+def run_phases(exchange, start_dt, end_dt, outputfilename, measure_memory):
+    """
+    Runs the phases fetch, convert and write once.
+
+    @param return: dict with the duration and the peak memory of each phase
+                   and the number of fetched and emitted events
+    """
+
+    durations = {}
+    peaks = {}
+
+    def phase(name, function):
+        if measure_memory:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        starttime = time.perf_counter()
+        result = function()
+        durations[name] = time.perf_counter() - starttime
+        if measure_memory:
+            peaks[name] = tracemalloc.get_traced_memory()[1] - baseline
+        return result
+
+    events = phase('fetch', lambda: list(exchange.fetch_rich_fields(exchange.fetch_calendar_events(start_dt, end_dt))))
+    entries = phase('convert', lambda: list(exchange.render_events(events)))
+    phase('write', lambda: exchange.write_orgfile(outputfilename, entries))
+
+    return {'durations': durations, 'peaks': peaks, 'fetched': len(events), 'emitted': len(entries),
+            'sha1': hashlib.sha1(''.join(entries).encode('utf-8')).hexdigest()}
+
+
+def benchmark(size, render_workers, arguments, latency, repeat, measure_memory):
+    """
+    Benchmarks Exchange2Org with a number of synthetic events.
+
+    @param size: number of synthetic events
+    @param render_workers: number of processes converting the events
+    @param arguments: list of command line arguments for exchange2org
+    @param latency: seconds per fetched page
+    @param repeat: the best of this number of runs is reported
+    @param measure_memory: boolean whether to measure the peak memory in an additional run
+    @param return: dict with the results
+    """
+
+    exchange2org.options = exchange2org.parser.parse_args(arguments + ['--render-workers', str(render_workers),
+                                                                       'benchmark.org'])
+    logger = logging.getLogger('benchmark')
+
+    starttime = time.perf_counter()
+    items = fakeexchange.generate_calendar_items(size)
+    generate_duration = time.perf_counter() - starttime
+
+    exchange = exchange2org.Exchange2Org(load_template_config(), logger,
+                                         account=fakeexchange.FakeAccount(items, latency=latency))
+    first_day = fakeexchange.FIRST_DAY
+    start_dt = exchange2org.exchangelib.EWSDateTime(first_day.year, first_day.month, first_day.day).replace(tzinfo=exchange.tz)
+    end_dt = start_dt + datetime.timedelta(days=fakeexchange.DAYS)
+
+    with tempfile.TemporaryDirectory() as directory:
+        outputfilename = os.path.join(directory, 'benchmark.org')
+
+        best = None
+        for run in range(repeat):
+            data = run_phases(exchange, start_dt, end_dt, outputfilename, False)
+            if best is None or sum(data['durations'].values()) < sum(best['durations'].values()):
+                best = data
+
+        if measure_memory:
+            tracemalloc.start()
+            best['peaks'] = run_phases(exchange, start_dt, end_dt, outputfilename, True)['peaks']
+            tracemalloc.stop()
+
+    total = sum(best['durations'].values())
+    return {'size': size,
+            'render_workers': render_workers,
+            'fetched': best['fetched'],
+            'emitted': best['emitted'],
+            'generate_seconds': generate_duration,
+            'seconds': best['durations'],
+            'total_seconds': total,
+            'events_per_second': {'convert': best['fetched'] / best['durations']['convert'],
+                                  'total': best['fetched'] / total},
+            'peak_memory_bytes': best['peaks'],
+            'output_sha1': best['sha1']}
+
+
+def print_result(result, previous=None, baseline=None):
+    """
+    Prints one result and its relative change compared to a previous
+    result and its speedup compared to a baseline result with a
+    different number of processes.
+    """
+
+    def change(new, old):
+        if not old:
+            return ''
+        return ' (%+.1f%%)' % (100.0 * (new - old) / old)
+
+    print('%7d events, %2d workers: %5d emitted, %9.0f events/s total%s, %9.0f events/s convert%s' % (
+        result['size'], result['render_workers'], result['emitted'],
+        result['events_per_second']['total'],
+        change(result['events_per_second']['total'], previous and previous['events_per_second']['total']),
+        result['events_per_second']['convert'],
+        change(result['events_per_second']['convert'], previous and previous['events_per_second']['convert'])))
+    for phase in PHASES:
+        line = '        %-8s %8.3f s%s' % (phase, result['seconds'][phase],
+                                           change(result['seconds'][phase], previous and previous['seconds'][phase]))
+        if phase in result['peak_memory_bytes']:
+            line += ', peak memory %8.1f MiB' % (result['peak_memory_bytes'][phase] / 1024.0 / 1024.0)
+        print(line)
+    if baseline:
+        print('        speedup  %8.2fx convert, %.2fx total compared to %d workers' % (
+            baseline['seconds']['convert'] / result['seconds']['convert'],
+            baseline['total_seconds'] / result['total_seconds'], baseline['render_workers']))
+        if result['output_sha1'] != baseline['output_sha1']:
+            print('        WARNING: the output differs from the output of %d workers' % baseline['render_workers'])
+
+
+def main():
+    """Main function"""
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,10000,100000',
+                        help='Comma separated numbers of synthetic events. Default: 1000,10000,100000')
+    parser.add_argument('--render-workers', default='1',
+                        help='Comma separated numbers of processes converting the events. Default: 1')
+    parser.add_argument('--latency', metavar='MILLISECONDS', type=float, default=0,
+                        help='Simulated latency of each fetched page. Default: 0')
+    parser.add_argument('--repeat', metavar='NUMBER', type=int, default=1,
+                        help='Report the best of NUMBER runs. Default: 1')
+    parser.add_argument('--no-memory', dest='memory', action='store_false',
+                        help='Do not measure the peak memory, which needs an additional run')
+    parser.add_argument('--json', metavar='FILE', help='Save the results as JSON')
+    parser.add_argument('--compare', metavar='FILE', help='Compare the results with the JSON results of a previous run')
+    parser.add_argument('arguments', nargs='*', help='Arguments for exchange2org, given after "--"')
+    options = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)-8s %(message)s")
+
+    previous = {}
+    if options.compare:
+        with open(options.compare, 'r') as comparehandle:
+            # results of versions without --render-workers were converted in the main process:
+            previous = {(result['size'], result.get('render_workers', 1)): result
+                        for result in json.load(comparehandle)['results']}
+
+    results = []
+    for size in [int(size) for size in options.sizes.split(',')]:
+        baseline = None
+        for render_workers in [int(workers) for workers in options.render_workers.split(',')]:
+            result = benchmark(size, render_workers, options.arguments, options.latency / 1000.0,
+                               max(1, options.repeat), options.memory)
+            print_result(result, previous.get((size, render_workers)), baseline)
+            results.append(result)
+            baseline = baseline or result
+
+    if options.json:
+        with open(options.json, 'w') as jsonhandle:
+            json.dump({'version': exchange2org.PROG_VERSION_DATE,
+                       'python': platform.python_version(),
+                       'date': datetime.datetime.now().strftime('%Y-%m-%dT%H:%M:%S'),
+                       'arguments': options.arguments,
+                       'latency_milliseconds': options.latency,
+                       'results': results}, jsonhandle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
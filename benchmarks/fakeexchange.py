@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+A fake Exchange backend for benchmarking exchange2org without a server.
+
+It generates synthetic exchangelib.CalendarItem objects and offers the
+parts of the exchangelib.Account interface used by exchange2org,
+including the pull and streaming notifications of --watch. An
+instance of FakeAccount can be passed as the account parameter of
+Exchange2Org.
+"""
+
+import base64
+import bisect
+import datetime
+import random
+import threading
+import time
+
+import exchangelib
+
+# Subjects of synthetic events. 'Christmas Day' is part of OMIT_SUBJECTS
+# of the configuration template.
+SUBJECTS = ['Team meeting', 'Project review', 'Lunch', '1:1', 'Customer call', 'Workshop',
+            'Budget planning', 'Christmas Day', 'Sprint planning', 'Retrospective']
+
+LOCATIONS = [None, None, 'Room 1.23', 'Meeting room "Graz"', 'Skype', 'Cafeteria']
+
+CATEGORIES = [['Org-mode'], ['Customer'], ['Private'], ['Customer', 'Travel']]
+
+# Default time range of synthetic events:
+FIRST_DAY = datetime.date(2026, 1, 5)
+DAYS = 365
+
+# The longest synthetic event lasts less than that:
+MAX_DURATION = datetime.timedelta(days=5)
+
+
+def item_id(number):
+    """
+    Returns a base64 encoded item ID which is long enough for the entry
+    ID conversion of Exchange2Org.
+
+    @param number: integer which makes the ID unique
+    """
+    return base64.b64encode(b'\x00\x00\x00\x00' + number.to_bytes(4, 'big') * 17).decode('ascii')
+
+
+def generate_calendar_items(number, first_day=FIRST_DAY, days=DAYS, seed=0):
+    """
+    Generates a list of synthetic calendar items which are spread over
+    the given days and sorted by their start.
+
+    The mix contains all-day, multi-day, cancelled, categorized and
+    recurring events as well as events with omitted subjects.
+
+    @param number: number of items
+    @param first_day: datetime.date of the first day
+    @param days: number of days the items are spread over
+    @param seed: seed of the random number generator
+    @param return: list of exchangelib.CalendarItem
+    """
+
+    rng = random.Random(seed)
+    tz = exchangelib.EWSTimeZone('UTC')
+    first = datetime.datetime.combine(first_day, datetime.time(0, 0))
+    items = []
+
+    for index in range(number):
+        # Business hours in quarter-hour steps:
+        day = index * days // number
+        start = first + datetime.timedelta(days=day, minutes=7 * 60 + 15 * rng.randrange(44))
+        kind = rng.random()
+        properties = dict(id=item_id(index), changekey='CQAAABYAAAA' + str(index),
+                          subject=rng.choice(SUBJECTS), location=rng.choice(LOCATIONS),
+                          is_all_day=False, is_cancelled=False, type='Single', uid='uid-' + str(index))
+
+        if kind < 0.10:
+            # all-day event, possibly spanning several days:
+            start_date = start.date()
+            end_date = start_date + datetime.timedelta(days=1 if rng.random() < 0.7 else rng.randrange(2, 5))
+            properties.update(is_all_day=True,
+                              start=exchangelib.EWSDate.from_date(start_date),
+                              end=exchangelib.EWSDate.from_date(end_date))
+        else:
+            if kind < 0.15:
+                # multi-day event, e.g. a trip:
+                end = start + datetime.timedelta(days=rng.randrange(1, 4), hours=rng.randrange(8))
+            else:
+                end = start + datetime.timedelta(minutes=15 * rng.randrange(1, 9))
+            properties.update(start=exchangelib.EWSDateTime.from_datetime(start.replace(tzinfo=tz)),
+                              end=exchangelib.EWSDateTime.from_datetime(end.replace(tzinfo=tz)))
+
+        if 0.15 <= kind < 0.20:
+            properties['is_cancelled'] = True
+        if 0.20 <= kind < 0.50:
+            # occurrence of one of a few recurring series:
+            series = rng.randrange(20)
+            properties.update(type='Occurrence', uid='uid-series-' + str(series),
+                              subject=SUBJECTS[series % len(SUBJECTS)])
+        if rng.random() < 0.2:
+            properties['categories'] = rng.choice(CATEGORIES)
+
+        items.append(exchangelib.CalendarItem(**properties))
+
+    items.sort(key=lambda item: timestamp(item.start))
+    return items
+
+
+def timestamp(d):
+    """
+    Returns the POSIX timestamp of an EWSDate (midnight UTC) or EWSDateTime.
+    """
+    if isinstance(d, datetime.datetime):
+        return d.timestamp()
+    return datetime.datetime.combine(d, datetime.time(0, 0), tzinfo=datetime.timezone.utc).timestamp()
+
+
+class FakeQuerySet(object):
+    """
+    Iterates over the items of a fake calendar view page by page. Each
+    page simulates a round trip to the server by sleeping for the
+    latency of the calendar. Like a calendar view of the server, the
+    items only contain the requested fields which are not complex.
+    """
+
+    def __init__(self, calendar, start, end):
+        self.calendar = calendar
+        self.start = start
+        self.end = end
+        self.only_fields = None
+        self.page_size = None
+
+    def only(self, *fields):
+        self.only_fields = fields
+        return self
+
+    def __iter__(self):
+        page_size = self.page_size or self.calendar.PAGE_SIZE
+        items = self.calendar.items_between(self.start, self.end)
+        fields = [field for field in self.only_fields or []
+                  if not exchangelib.CalendarItem.get_field_by_fieldname(field).is_complex]
+        for offset in range(0, len(items), page_size):
+            self.calendar.pages_fetched += 1
+            if self.calendar.latency:
+                time.sleep(self.calendar.latency)
+            if self.only_fields is None:
+                yield from items[offset:offset + page_size]
+            else:
+                for item in items[offset:offset + page_size]:
+                    yield exchangelib.CalendarItem(id=item.id, changekey=item.changekey,
+                                                   **{field: getattr(item, field) for field in fields})
+
+
+class FakeCalendar(object):
+    """
+    Calendar folder of a FakeAccount.
+    """
+
+    # Default page size of exchangelib:
+    PAGE_SIZE = 100
+
+    def __init__(self, items, latency=0):
+        """
+        @param items: list of calendar items sorted by their start
+        @param latency: seconds each page of a view takes to fetch
+        """
+        self.items = items
+        self.latency = latency
+        self.pages_fetched = 0
+        self.starts = [timestamp(item.start) for item in items]
+        self.items_by_id = {item.id: item for item in items}
+        # Events reported to the subscriptions of --watch, see modify():
+        self.notifications = []
+        self.notified = threading.Condition()
+        self.subscriptions = {}
+
+    def items_between(self, start, end):
+        """
+        Returns all items overlapping the time range. Like EWS, items
+        ending exactly at the start are included.
+        """
+        first = bisect.bisect_left(self.starts, start.timestamp() - MAX_DURATION.total_seconds())
+        last = bisect.bisect_left(self.starts, end.timestamp())
+        return [item for item in self.items[first:last] if timestamp(item.end) >= start.timestamp()]
+
+    def view(self, start, end, max_items=None):
+        return FakeQuerySet(self, start, end)
+
+    def modify(self, item, **fields):
+        """
+        Changes fields of an item like another client of the server and
+        notifies the subscriptions. Start and end can not be changed.
+
+        @param item: one of the items of the calendar
+        @param fields: new values of the fields
+        """
+        with self.notified:
+            for field, value in fields.items():
+                setattr(item, field, value)
+            item.changekey = 'CQAAABYAAAA' + str(len(self.notifications)) + '-' + item.changekey
+            self.notifications.append(exchangelib.properties.ModifiedEvent(
+                watermark=str(len(self.notifications) + 1),
+                item_id=exchangelib.properties.ItemId(id=item.id, changekey=item.changekey)))
+            self.notified.notify_all()
+
+    def subscribe_to_pull(self, event_types=None, watermark=None, timeout=60):
+        return 'pull', str(len(self.notifications))
+
+    def get_events(self, subscription_id, watermark):
+        if self.latency:
+            time.sleep(self.latency)
+        events = self.notifications[int(watermark):]
+        if events:
+            yield exchangelib.properties.Notification(subscription_id=subscription_id, events=events)
+
+    def subscribe_to_streaming(self, event_types=None):
+        subscription_id = 'streaming-' + str(len(self.subscriptions))
+        self.subscriptions[subscription_id] = len(self.notifications)
+        return subscription_id
+
+    def get_streaming_events(self, subscription_id, connection_timeout=1, max_notifications_returned=None):
+        deadline = time.time() + connection_timeout * 60
+        while time.time() < deadline:
+            position = self.subscriptions[subscription_id]
+            with self.notified:
+                self.notified.wait_for(lambda: len(self.notifications) > position, timeout=deadline - time.time())
+                events = self.notifications[position:]
+            if events:
+                self.subscriptions[subscription_id] = position + len(events)
+                yield exchangelib.properties.Notification(subscription_id=subscription_id, events=events)
+
+    def unsubscribe(self, subscription_id):
+        self.subscriptions.pop(subscription_id, None)
+
+
+class FakeAccount(object):
+    """
+    Stand-in for exchangelib.Account with a calendar of synthetic items.
+    """
+
+    def __init__(self, items, latency=0):
+        self.calendar = FakeCalendar(items, latency=latency)
+        self.items_fetched = 0
+
+    def fetch(self, ids, only_fields=None, chunk_size=None):
+        """
+        Returns the requested fields of the items with the given tuples
+        of item ID and changekey. Organizer, attendees and the HTML body
+        are synthetic. Each call simulates one round trip to the server.
+        """
+        if self.calendar.latency:
+            time.sleep(self.calendar.latency)
+        self.items_fetched += len(ids)
+        items = []
+        for itemid, changekey in ids:
+            item = self.calendar.items_by_id[itemid]
+            number = int.from_bytes(base64.b64decode(itemid)[4:8], 'big')
+            people = [exchangelib.Attendee(mailbox=exchangelib.Mailbox(name='Person ' + str(number % 7 + index),
+                                                                       email_address='person%d@example.com' % (number % 7 + index)))
+                      for index in range(3)]
+            fields = dict(organizer=people[0].mailbox, required_attendees=people[1:], optional_attendees=None,
+                          body=exchangelib.HTMLBody('<html><head><style>p {margin: 0}</style></head><body>'
+                                                    '<p>Agenda of meeting ' + str(number) + ':</p><ul><li>Status</li>'
+                                                    '<li>Next&nbsp;steps</li></ul><p>Join: <a href="https://example.com/'
+                                                    + str(number) + '">online meeting</a></p></body></html>'))
+            items.append(exchangelib.CalendarItem(
+                id=itemid, changekey=changekey,
+                **{field: fields[field] if field in fields else getattr(item, field) for field in only_fields or fields}))
+        return items
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Runs --watch of exchange2org against the fake Exchange backend of
+fakeexchange.py and measures the time from a change of an event until
+the output file shows it.
+
+After the first output file was written, the subjects of events are
+changed one after the other. The regeneration after the second change
+fails with a server error, which --watch has to survive. The script
+fails if a change does not show up within --timeout seconds.
+
+Example usages:
+  benchmarks/watch.py
+  benchmarks/watch.py --changes 20 -- --watch-mode streaming
+      … arguments after "--" are passed to exchange2org.
+"""
+
+import argparse
+import datetime
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import benchmark  # noqa: E402
+import exchange2org  # noqa: E402
+import fakeexchange  # noqa: E402
+
+# Seconds between two checks of the output file:
+POLL_INTERVAL = 0.05
+
+
+def fail_next_view(calendar, error):
+    """
+    Makes the next calendar view of the fake calendar raise an error
+    like a busy server.
+    """
+
+    view = calendar.view
+
+    def failing_view(start, end, max_items=None):
+        calendar.view = view
+        raise error
+
+    calendar.view = failing_view
+
+
+def wait_for_text(filename, text, timeout):
+    """
+    Waits until the file contains the text.
+
+    @param return: True if the file contained the text within the timeout
+    """
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if os.path.isfile(filename):
+            with open(filename, 'r', encoding='utf-8') as filehandle:
+                if text in filehandle.read():
+                    return True
+        time.sleep(POLL_INTERVAL)
+    return False
+
+
+def main():
+    """Main function"""
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=1000, help='Number of synthetic events. Default: 1000')
+    parser.add_argument('--changes', metavar='NUMBER', type=int, default=5,
+                        help='Number of changed events. Default: 5')
+    parser.add_argument('--latency', metavar='MILLISECONDS', type=float, default=0,
+                        help='Simulated latency of each request. Default: 0')
+    parser.add_argument('--timeout', metavar='SECONDS', type=float, default=30,
+                        help='Seconds a change may take to show up in the output file. Default: 30')
+    parser.add_argument('arguments', nargs='*', help='Arguments for exchange2org, given after "--"')
+    options = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)-8s %(message)s")
+
+    directory = tempfile.mkdtemp()
+    try:
+        outputfilename = os.path.join(directory, 'watch.org')
+        exchange2org.options = exchange2org.parser.parse_args(['--calendar', '--watch', '--watch-interval', '1',
+                                                               '--debounce', '0'] + options.arguments + [outputfilename])
+
+        items = fakeexchange.generate_calendar_items(options.size)
+        account = fakeexchange.FakeAccount(items, latency=options.latency / 1000.0)
+        exchange = exchange2org.Exchange2Org(benchmark.load_template_config(), logging.getLogger('watch'), account=account)
+
+        first_day = fakeexchange.FIRST_DAY
+        last_day = first_day + datetime.timedelta(days=fakeexchange.DAYS)
+
+        def time_range():
+            return ([first_day.year, first_day.month, first_day.day], [last_day.year, last_day.month, last_day.day])
+
+        threading.Thread(target=exchange.watch_calendar, args=(time_range, outputfilename), daemon=True).start()
+        if not wait_for_text(outputfilename, '* Calendar events', options.timeout):
+            sys.exit('The output file was not written within ' + str(options.timeout) + ' seconds.')
+
+        # Cancelled events and events of OMIT_SUBJECTS are not written:
+        candidates = [item for item in items if not item.is_cancelled and item.subject != 'Christmas Day']
+        latencies = []
+        for number in range(options.changes):
+            failing = number == 1
+            if failing:
+                fail_next_view(account.calendar, exchange2org.exchangelib.errors.ErrorServerBusy('The server is busy.'))
+            subject = 'Changed event ' + str(number)
+            starttime = time.perf_counter()
+            account.calendar.modify(candidates[number * len(candidates) // options.changes], subject=subject)
+            if not wait_for_text(outputfilename, subject, options.timeout):
+                sys.exit('Change ' + str(number) + ' did not show up within ' + str(options.timeout) + ' seconds.')
+            latencies.append(time.perf_counter() - starttime)
+            print('change %3d: %6.2f s%s' % (number, latencies[-1], ', after a failed regeneration' if failing else ''))
+
+        print('%d changes of %d events: %.2f s median, %.2f s maximum' % (
+            len(latencies), options.size, sorted(latencies)[len(latencies) // 2], max(latencies)))
+    finally:
+        # The thread of --watch is stopped with the process:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -24,16 +24,152 @@ def safe_import(library):
 import sys
 import os
 import re
+import stat
+import calendar
+import types
+import tempfile
+import itertools
+import queue
+import threading
+import contextlib
+import collections
+import html.parser
 safe_import('base64')       # itemID/entryID conversion
+safe_import('json')         # sync state of --incremental, render cache
+safe_import('hashlib')      # settings hash of the render cache, password hash of the session cache
 safe_import('argparse')     # for handling command line arguments
 safe_import('time')
 safe_import('datetime')
 safe_import('logging')
-safe_import('exchangelib')  # for accessing Exchange servers
+
+# exchangelib pulls in lxml, requests, cryptography and more. It is
+# imported by import_exchangelib() as soon as a connection is made so
+# that --help, --check-config and argument errors start fast:
+exchangelib = None
+
+
+def import_exchangelib():
+    """Imports exchangelib on first use"""
+    if exchangelib is None:
+        safe_import('exchangelib')  # for accessing Exchange servers
 
 
 PROG_VERSION_DATE = PROG_VERSION[13:23]
 
+# Timeout of pull subscriptions of --watch in minutes. It is reset by
+# every request for new events:
+WATCH_PULL_SUBSCRIPTION_TIMEOUT = 30
+# Number of minutes after which the connection of a streaming
+# subscription of --watch is re-established:
+WATCH_STREAMING_CONNECTION_TIMEOUT = 10
+# An output file is regenerated at latest after this multiple of
+# --debounce seconds, even when the changes do not stop:
+WATCH_MAX_DEBOUNCE_FACTOR = 6
+# After a failed regeneration, --watch retries after --watch-interval
+# seconds, doubling the delay after each further failure up to this
+# number of seconds:
+WATCH_MAX_RETRY_DELAY = 600
+
+# Directory of the configuration file exchange2orgconfig.py:
+CONFIGDIR = os.path.join(os.path.expanduser("~"), ".config/exchange2org")
+
+# Directory of the session cache of --session-cache:
+SESSION_CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser("~"), ".cache"),
+                                 "exchange2org")
+SESSION_CACHE_VERSION = 2
+# Iterations of the salted hash of the password which identifies the
+# credentials a session cache file was written with:
+SESSION_CACHE_PASSWORD_ITERATIONS = 100000
+
+# Settings of the configuration file: name, allowed types, required?
+CONFIGURATION_SETTINGS = [
+    ('EXCHANGE_SERVER', (str,), True),
+    ('SERVICE_ENDPOINT', (str, type(None)), False),
+    ('USERNAME', (str,), True),
+    ('PASSWORD', (str,), True),
+    ('PRIMARY_SMTP_ADDRESS', (str,), True),
+    ('TIMEZONE', (str,), True),
+    ('CATEGORY', (str,), True),
+    ('TAGS', (list,), True),
+    ('OUTLOOK_HYPERLINK', (str,), True),
+    ('OMIT_SUBJECTS', (list,), True),
+    ('WRITE_PROPERTIES_DRAWER', (bool,), True),
+    ('WRITE_SCHEDULED', (bool,), True),
+    ('WRITE_DEADLINE', (bool,), True),
+    ('ENTRY_TEMPLATE', (str, type(None)), False),
+    ('RICH_FIELDS', (list,), False),
+    ('RENDER_CACHE_MAX_ENTRIES', (int,), False),
+    ('ACCOUNTS', (list,), False),
+]
+
+# The sync state of --incremental is stored next to the output file:
+SYNC_STATE_SUFFIX = '.sync.json'
+SYNC_STATE_VERSION = 1
+
+# Shards of --shard are named like 2026-03.org or 2026-W09.org. The
+# index file lists them for org-agenda-files:
+SHARD_FILENAME_REGEX = re.compile(r'^\d{4}-(\d{2}|W\d{2})\.org$')
+SHARD_INDEX_FILENAME = 'agenda-files'
+
+# The checkpoint of --backfill is stored next to the output file:
+BACKFILL_CHECKPOINT_SUFFIX = '.backfill.json'
+BACKFILL_CHECKPOINT_VERSION = 1
+# A chunk of --backfill is retried this number of times after temporary
+# errors. The first retry waits BACKFILL_RETRY_DELAY seconds, every
+# further retry twice as long as the one before:
+BACKFILL_RETRIES = 5
+BACKFILL_RETRY_DELAY = 10
+
+# The render cache of --render-cache is stored next to the output file:
+RENDER_CACHE_SUFFIX = '.render-cache.json'
+RENDER_CACHE_VERSION = 1
+# Default for RENDER_CACHE_MAX_ENTRIES of the configuration file:
+RENDER_CACHE_MAX_ENTRIES = 20000
+
+# Time-stamp of the generation in the heading of output files and the
+# index of the heading's line, which follows the mode line:
+GENERATED_AT_REGEX = re.compile(r' at \d{4}-\d\d-\d\dT\d\d:\d\d:\d\d')
+ORGFILE_HEADING_LINE = 1
+
+# Footer of output files:
+ORGFILE_FOOTER = '\n\n# Local Variables:\n# mode: auto-revert\n# End:\n'
+
+# Field names of ENTRY_TEMPLATE:
+ENTRY_TEMPLATE_FIELDS = ['timestamp', 'subject', 'location', 'link', 'entry_id', 'date_range', 'debug',
+                         'organizer', 'attendees', 'body']
+# Fields of ENTRY_TEMPLATE and RICH_FIELDS which are fetched in a second
+# phase for events which are not omitted, with their CalendarItem fields:
+RICH_FIELDS = {'organizer': ['organizer'],
+               'attendees': ['required_attendees', 'optional_attendees'],
+               'body': ['body']}
+# Fields of calendar events which convert_to_orgmode() and omitted_reason()
+# read, see EventRecord:
+EVENT_RECORD_FIELDS = ('id', 'changekey', 'subject', 'start', 'end', 'location', 'is_all_day', 'is_cancelled',
+                       'categories', 'organizer', 'legacy_free_busy_status', 'required_attendees',
+                       'optional_attendees', 'body')
+# Number of events which a worker process of --render-workers converts at once:
+RENDER_CHUNK_SIZE = 500
+# A field of ENTRY_TEMPLATE with optional text before and after its name:
+ENTRY_TEMPLATE_FIELD_REGEX = re.compile(r'\{([^{}]*?)(' + '|'.join(ENTRY_TEMPLATE_FIELDS) + r')([^{}]*)\}')
+
+# Values of the free/busy status of events:
+FREEBUSY_STATUSES = ['Free', 'Tentative', 'Busy', 'OOF', 'WorkingElsewhere', 'NoData']
+
+# Values of the flag status (PidTagFlagStatus) of messages of --mail:
+FLAG_STATUS_COMPLETE = 1
+FLAG_STATUS_FLAGGED = 2
+
+# FindItem returns only the first 255 characters of text fields like the UID:
+FINDITEM_TEXT_LENGTH = 255
+
+# Free/busy statuses which --freebusy writes unless --include-freebusy is given:
+FREEBUSY_WRITTEN_STATUSES = ['Tentative', 'Busy', 'OOF', 'WorkingElsewhere']
+# Exchange limits the time window of GetUserAvailability requests to 42 days:
+FREEBUSY_MAX_DAYS = 42
+
+# Org-mode priority cookies of the importance of tasks and messages:
+IMPORTANCE_PRIORITIES = {'High': '[#A] ', 'Low': '[#C] '}
+
 DAY_STRING_REGEX = re.compile('([12]\d\d\d)-([012345]\d)-([012345]\d)')
 
 DESCRIPTION = "This tool connects to your Exchange server and extracts data\n\
@@ -48,6 +184,8 @@ You can configure the behavior and output via a configuration file.\n\
 Example usages:\n\
   exchange2org --calendar some/subfolder/my_exchange_calendar.org\n\
       … writes your calendar events into the Org-mode file.\n\
+  exchange2org --mail Inbox --flagged some/subfolder/my_flagged_mail.org\n\
+      … writes your flagged messages as TODO entries into the Org-mode file.\n\
 \n\
 \n"
 
@@ -64,10 +202,32 @@ parser = argparse.ArgumentParser(prog=sys.argv[0],
                                  epilog=EPILOG,
                                  description=DESCRIPTION)
 
-parser.add_argument(dest='outputfile', metavar='FILE', nargs=1, help='The filename of the output file')
+parser.add_argument(dest='outputfile', metavar='FILE', nargs='?',
+                    help='The filename of the output file. Not used with --batch.')
 
 parser.add_argument('--calendar', action='store_true', help='Extract the calendar as Org-mode events. ')
 
+parser.add_argument('--tasks', action='store_true',
+                    help='Extract the open tasks and the tasks completed since the start day as Org-mode TODO entries.')
+
+parser.add_argument('--mail', metavar='FOLDER',
+                    help='Extract the messages received in the time range from the mail folder FOLDER ' +
+                    '(like "Inbox" or "Inbox/Projects") as Org-mode entries. Flagged messages become TODO entries.')
+
+parser.add_argument('--flagged', action='store_true',
+                    help='With --mail, only extract flagged messages, regardless of the time range.')
+
+parser.add_argument('--freebusy', metavar='ADDRESSES', action='append',
+                    help='Extract the free/busy times of the people with these comma separated e-mail ' +
+                    'addresses as one subtree per person. May be given several times.')
+
+parser.add_argument('--batch', action='store_true',
+                    help='Process all accounts listed in ACCOUNTS of the configuration file, ' +
+                    'each of them written to its own OUTPUTFILE.')
+
+parser.add_argument('--jobs', metavar='NUMBER', type=int, default=4,
+                    help='Number of accounts of --batch which are processed concurrently. Default: 4')
+
 parser.add_argument('--startday', metavar='date-or-days', nargs=1, help='Starting date for fetching data. ' +
                     'Default: 60 days in past. "date-or-days" is either of form "YYYY-MM-DD" or a number.')
 
@@ -76,16 +236,123 @@ parser.add_argument('--endday', metavar='date-or-days', nargs=1, help='End date
 
 parser.add_argument('--ignore-category', metavar='CATEGORY', nargs=1, help='Category whose events will be omitted.')
 
+parser.add_argument('--include-category', dest='include_categories', metavar='CATEGORY', action='append',
+                    help='Only write events of this category. May be given several times.')
+
+parser.add_argument('--exclude-category', dest='exclude_categories', metavar='CATEGORY', action='append',
+                    help='Omit events of this category like --ignore-category. May be given several times.')
+
+parser.add_argument('--include-organizer', dest='include_organizers', metavar='ADDRESS', action='append',
+                    help='Only write events organized by this e-mail address or name. May be given several times.')
+
+parser.add_argument('--exclude-organizer', dest='exclude_organizers', metavar='ADDRESS', action='append',
+                    help='Omit events organized by this e-mail address or name. May be given several times.')
+
+parser.add_argument('--include-freebusy', dest='include_freebusy', metavar='STATUS', action='append',
+                    choices=FREEBUSY_STATUSES,
+                    help='Only write events with this free/busy status (' + ', '.join(FREEBUSY_STATUSES) +
+                    '). May be given several times.')
+
+parser.add_argument('--exclude-freebusy', dest='exclude_freebusy', metavar='STATUS', action='append',
+                    choices=FREEBUSY_STATUSES,
+                    help='Omit events with this free/busy status. May be given several times.')
+
+parser.add_argument('--repeaters', action='store_true',
+                    help='Fetch recurring series once instead of each occurrence. Simple series become ' +
+                    'single entries with Org-mode repeaters, all others are expanded locally.')
+
+parser.add_argument('--fetch-window', choices=['week', 'month'],
+                    help='Split the time range into windows of a week or a month which are fetched ' +
+                    'concurrently. Speeds up fetching large time ranges.')
+
+parser.add_argument('--fetch-workers', metavar='NUMBER', type=int, default=4,
+                    help='Number of windows of --fetch-window which are fetched concurrently. Default: 4')
+
+parser.add_argument('--page-size', dest='page_size', metavar='NUMBER', type=int,
+                    help='Number of events fetched per request. Default: 100')
+
+parser.add_argument('--prefetch', metavar='PAGES', type=int, default=2,
+                    help='Number of pages a background thread fetches ahead while the current page is ' +
+                    'converted and written. 0 fetches and converts alternately. Default: 2')
+
+parser.add_argument('--shard', choices=['week', 'month'],
+                    help='Write the events into one file per week or month in the directory FILE ' +
+                    'together with the index file "' + SHARD_INDEX_FILENAME + '" for org-agenda-files. ' +
+                    'Each event is written into the file of its start. Only changed files are rewritten.')
+
+parser.add_argument('--backfill', action='store_true',
+                    help='Write the output file in chunks of --backfill-chunk for long time ranges like archives ' +
+                    'of several years. The progress is recorded in FILE' + BACKFILL_CHECKPOINT_SUFFIX +
+                    ' so that an interrupted run resumes with the next chunk.')
+
+parser.add_argument('--backfill-chunk', dest='backfill_chunk', choices=['week', 'month'], default='month',
+                    help='Time range of each chunk of --backfill. Default: month')
+
+parser.add_argument('--freeze-past', dest='freeze_past', action='store_true',
+                    help='With --shard, keep existing files of past weeks or months as they are without ' +
+                    'fetching their events again')
+
+parser.add_argument('--rich-batch-size', dest='rich_batch_size', metavar='NUMBER', type=int, default=100,
+                    help='Number of events whose organizer, attendees or body are fetched per request. Default: 100')
+
+parser.add_argument('--rich-workers', dest='rich_workers', metavar='NUMBER', type=int, default=2,
+                    help='Number of concurrent requests fetching organizer, attendees or body. Default: 2')
+
+parser.add_argument('--render-workers', dest='render_workers', metavar='NUMBER', type=int, default=1,
+                    help='Number of processes converting events to Org-mode entries. Helps with tens of ' +
+                    'thousands of events. Default: 1, which converts them in the main process')
+
+parser.add_argument('--incremental', action='store_true',
+                    help='Synchronize only changed events since the last run. The sync state is ' +
+                    'stored next to the output file in FILE' + SYNC_STATE_SUFFIX + '.')
+
+parser.add_argument('--render-cache', action='store_true',
+                    help='Re-use the Org-mode representation of unchanged events from previous runs. The cache ' +
+                    'is stored next to the output file in FILE' + RENDER_CACHE_SUFFIX + '.')
+
+parser.add_argument('--watch', action='store_true',
+                    help='Keep running and regenerate the output file whenever the server reports ' +
+                    'changes of the calendar.')
+
+parser.add_argument('--watch-mode', dest='watch_mode', choices=['pull', 'streaming'], default='pull',
+                    help='Notifications of --watch: "pull" requests them every --watch-interval seconds, ' +
+                    '"streaming" keeps a connection the server pushes them over. Default: pull')
+
+parser.add_argument('--watch-interval', metavar='SECONDS', type=int, default=30,
+                    help='Seconds between two requests for notifications of "--watch-mode pull" and before ' +
+                    'retrying after errors. Default: 30')
+
+parser.add_argument('--debounce', metavar='SECONDS', type=int, default=10,
+                    help='Seconds without further changes before --watch regenerates the output file. Default: 10')
+
+parser.add_argument('--check-config', action='store_true',
+                    help='Validate the configuration file without connecting to the server.')
+
 parser.add_argument('-s', '--dryrun', dest='dryrun', action='store_true',
                     help='enable dryrun mode: simulate what would happen, do not modify anything')
 
 parser.add_argument('-v', '--verbose', dest='verbose', action='store_true',
                     help='enable verbose mode')
 
+parser.add_argument('--session-cache', dest='session_cache', action='store_true',
+                    help='Cache the EWS URL, the authentication type and the server version in ' +
+                    SESSION_CACHE_DIR + ' in order to skip probing them on the next run')
+
+parser.add_argument('--stats', action='store_true',
+                    help='Report the time of each phase, the number of EWS requests, the transferred bytes, ' +
+                    'the number of fetched, written and filtered events and the peak memory usage')
+
+parser.add_argument('--stats-file', dest='stats_file', metavar='FILE',
+                    help='Write the statistics of --stats as JSON to FILE')
+
 parser.add_argument('-q', '--quiet', dest='quiet', action='store_true',
                     help='enable quiet mode')
 
-options = parser.parse_args()
+# The parsed command line arguments, set by main():
+options = None
+
+# Statistics of --stats and --stats-file, set by main():
+statistics = None
 
 
 
@@ -140,6 +407,262 @@ def day_string_to_datetime(timestr):
     return datetime.datetime(year, month, day)
 
 
+class Statistics(object):
+    """
+    Collects the statistics of --stats and --stats-file. Phases may be
+    nested: their time is accounted to the innermost phase of the
+    current thread only, so the durations of all phases add up to the
+    time spent in them. Phases of concurrent threads add up.
+    """
+
+    # Matches the name of the EWS operation of a SOAP request:
+    OPERATION_REGEX = re.compile(rb'<s:Body>\s*<\w+:(\w+)')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.starttime = time.time()
+        self.phases = {}
+        self.counters = {}
+        self.requests = {}
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def add_time(self, phase, seconds):
+        with self.lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """
+        Context manager which accounts the time spent within to the phase.
+
+        @param name: name of the phase like 'fetch'
+        """
+
+        stack = self.local.__dict__.setdefault('stack', [])
+        now = time.perf_counter()
+        if stack:
+            # pause the enclosing phase:
+            self.add_time(stack[-1][0], now - stack[-1][1])
+        stack.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self.add_time(name, now - stack.pop()[1])
+            if stack:
+                # resume the enclosing phase:
+                stack[-1][1] = now
+
+    def timed_iterable(self, phase, iterable):
+        """
+        Yields the items of an iterable and accounts the time spent for
+        getting them to the phase, e.g. for generators which fetch from
+        the server.
+        """
+
+        iterator = iter(iterable)
+        while True:
+            with self.phase(phase):
+                item = next(iterator, StopIteration)
+            if item is StopIteration:
+                return
+            yield item
+
+    def timed_function(self, phase, function):
+        """
+        Returns a wrapper of the function which accounts the time of its
+        calls to the phase.
+        """
+
+        def timed(*args, **kwargs):
+            with self.phase(phase):
+                return function(*args, **kwargs)
+
+        return timed
+
+    def count(self, name, number=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + number
+
+    def count_request(self, body, response_length):
+        """
+        Counts one HTTP request to the server.
+
+        @param body: bytes of the request body
+        @param response_length: number of bytes of the response body
+        """
+
+        components = self.OPERATION_REGEX.search(body or b'')
+        operation = components.group(1).decode('ascii') if components else 'other'
+        with self.lock:
+            self.requests[operation] = self.requests.get(operation, 0) + 1
+            self.bytes_sent += len(body or b'')
+            self.bytes_received += response_length
+
+    def peak_rss(self):
+        """
+        Returns the peak resident set size of the process in bytes or
+        None where the module resource is not available.
+        """
+
+        try:
+            import resource
+        except ImportError:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes:
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+    def report(self):
+        """
+        Returns all statistics as a dict which can be saved as JSON.
+        """
+
+        with self.lock:
+            counters = dict(self.counters)
+            return {'version': PROG_VERSION_DATE,
+                    'date': datetime.datetime.fromtimestamp(self.starttime).strftime('%Y-%m-%dT%H:%M:%S'),
+                    'total_seconds': time.time() - self.starttime,
+                    'phase_seconds': dict(self.phases),
+                    'requests': sum(self.requests.values()),
+                    'requests_by_operation': dict(self.requests),
+                    # Each FindItem request returns one page of items:
+                    'pages_fetched': self.requests.get('FindItem', 0),
+                    'bytes_sent': self.bytes_sent,
+                    'bytes_received': self.bytes_received,
+                    'events_seen': counters.get('seen', 0),
+                    'events_emitted': counters.get('emitted', 0),
+                    # events whose details were fetched in a second phase, see fetch_rich_fields():
+                    'events_details_fetched': counters.get('details', 0),
+                    'events_filtered': {reason: counters.get(reason, 0) for reason in
+                                        ['cancelled', 'omit_subjects', 'category', 'organizer', 'freebusy']},
+                    # events which the server did not return because of filters, see server_restriction(),
+                    # or None if they were not counted:
+                    'events_filtered_by_server': counters.get('server'),
+                    'peak_rss_bytes': self.peak_rss()}
+
+    def log(self, logger):
+        """
+        Logs a human readable summary of the statistics.
+        """
+
+        report = self.report()
+        logger.info('statistics: %.3f seconds in total' % report['total_seconds'])
+        for phase, seconds in sorted(report['phase_seconds'].items(), key=lambda phase: -phase[1]):
+            logger.info('statistics: %-8s %8.3f seconds' % (phase, seconds))
+        logger.info('statistics: ' + str(report['requests']) + ' EWS requests (' +
+                    ', '.join(operation + ': ' + str(number) for operation, number in
+                              sorted(report['requests_by_operation'].items())) + '), ' +
+                    str(report['pages_fetched']) + ' pages fetched')
+        logger.info('statistics: ' + str(report['bytes_sent']) + ' bytes sent, ' +
+                    str(report['bytes_received']) + ' bytes received')
+        logger.info('statistics: ' + str(report['events_seen']) + ' events seen, ' +
+                    str(report['events_emitted']) + ' emitted, ' +
+                    str(report['events_details_fetched']) + ' with details fetched, filtered: ' +
+                    ', '.join(reason + ': ' + str(number) for reason, number in report['events_filtered'].items()) +
+                    ', by the server: ' + ('not counted' if report['events_filtered_by_server'] is None
+                                           else str(report['events_filtered_by_server'])))
+        if report['peak_rss_bytes'] is not None:
+            logger.info('statistics: peak memory usage %.1f MiB' % (report['peak_rss_bytes'] / 1024.0 / 1024.0))
+
+
+# Exchange2Org instance of a process of --render-workers, set by init_render_worker():
+render_worker = None
+
+
+def init_render_worker(config, parent_options, collect_statistics):
+    """
+    Initializes a process of --render-workers.
+
+    @param config: object with the attributes of the configuration module
+    @param parent_options: the parsed command line arguments of the main process
+    @param collect_statistics: boolean whether render_chunk() returns statistics
+    """
+    global options, statistics, render_worker
+    options = parent_options
+    statistics = Statistics() if collect_statistics else None
+    render_worker = Exchange2Org(config, logging.getLogger(), offline=True)
+
+
+def render_chunk(events):
+    """
+    Converts a chunk of events in a process of --render-workers.
+
+    @param events: list of EventRecord
+    @param return: tuple of the list of results of convert_to_orgmode() and the
+                   counters of the statistics of the chunk
+    """
+    outputs = [render_worker.convert_to_orgmode(event) for event in events]
+    counters = {}
+    if statistics:
+        with statistics.lock:
+            counters, statistics.counters = statistics.counters, {}
+    return outputs, counters
+
+
+def statistics_phase(name):
+    """
+    Returns a context manager which accounts the time spent within to
+    a phase of --stats or does nothing without --stats.
+    """
+    if statistics is None:
+        return contextlib.nullcontext()
+    return statistics.phase(name)
+
+
+def install_request_counter():
+    """
+    Makes exchangelib count all HTTP requests and the transferred bytes
+    for --stats. This has to happen before the first connection is set
+    up since the HTTP adapter is part of each session.
+    """
+
+    import_exchangelib()
+    import requests.adapters
+
+    class CountingHTTPAdapter(requests.adapters.HTTPAdapter):
+        def send(self, request, stream=False, **kwargs):
+            response = super().send(request, stream=stream, **kwargs)
+            if stream:
+                # streaming notifications of --watch are not read yet:
+                response_length = int(response.headers.get('Content-Length', 0))
+            else:
+                response_length = len(response.content)
+            body = request.body.encode('utf-8') if isinstance(request.body, str) else request.body
+            statistics.count_request(body, response_length)
+            return response
+
+    exchangelib.protocol.BaseProtocol.HTTP_ADAPTER_CLS = CountingHTTPAdapter
+
+
+class EventRecord(object):
+    """
+    Compact snapshot of a calendar event with the fields of
+    EVENT_RECORD_FIELDS only. exchangelib.CalendarItem objects have
+    about 80 fields, which makes them expensive to hold in memory and
+    to send to the processes of --render-workers. Records are pickled
+    as plain tuples of their values.
+    """
+
+    __slots__ = EVENT_RECORD_FIELDS
+
+    def __init__(self, event):
+        """
+        @param event: an Exchange calendar event or another EventRecord
+        """
+        for field in EVENT_RECORD_FIELDS:
+            setattr(self, field, getattr(event, field, None))
+
+    def __getstate__(self):
+        return tuple(getattr(self, field) for field in EVENT_RECORD_FIELDS)
+
+    def __setstate__(self, state):
+        for field, value in zip(EVENT_RECORD_FIELDS, state):
+            setattr(self, field, value)
+
+
 class Exchange2Org(object):
 
     logger = None
@@ -148,18 +671,238 @@ class Exchange2Org(object):
     tz = None
     exchange_config = None
 
-    def __init__(self, configuration, logger):
+    # dict of cached Org-mode entries of --render-cache, keyed by item ID:
+    render_cache = None
+
+    def __init__(self, configuration, logger, exchange_config=None, account=None, offline=False):
+        """
+        @param configuration: the configuration module or an object with the same attributes
+        @param logger: logger instance
+        @param exchange_config: optional exchangelib.Configuration to share its
+                                HTTP sessions with other instances
+        @param account: optional exchangelib.Account or an object with the same
+                        interface (like the fake backend of the benchmarks)
+                        which is used instead of connecting to the server
+        @param offline: boolean whether to only convert events without connecting
+                        to the server, like the processes of --render-workers
+        """
         self.logger = logger
         self.config = configuration
+        self.compile_entry_template()
+        import_exchangelib()
 
-        try:
-            self.exchange_config = exchangelib.Configuration(exchangelib.Credentials(self.config.USERNAME, self.config.PASSWORD), server=self.config.EXCHANGE_SERVER)
-            self.account = exchangelib.Account(self.config.PRIMARY_SMTP_ADDRESS, config=self.exchange_config, autodiscover=False, access_type=exchangelib.DELEGATE)
+        if statistics:
+            self.convert_to_orgmode = statistics.timed_function('convert', self.convert_to_orgmode)
+
+        if account or offline:
+            self.account = account
             self.tz = exchangelib.EWSTimeZone(self.config.TIMEZONE)
+            return
+
+        self.connect(exchange_config)
+
+    def connect(self, exchange_config=None, use_session_cache=True):
+        """
+        Sets up the account on the Exchange server.
+
+        @param exchange_config: optional exchangelib.Configuration to share its
+                                HTTP sessions with other instances
+        @param use_session_cache: boolean whether the settings of --session-cache may be used
+        """
+
+        try:
+            with statistics_phase('connect'):
+                if exchange_config:
+                    self.exchange_config = exchange_config
+                else:
+                    # Concurrent fetching of windows shares the connection pool of the account:
+                    self.exchange_config = exchange_configuration(self.config, max_connections_per_account(),
+                                                                  use_session_cache=use_session_cache)
+                self.account = exchangelib.Account(self.config.PRIMARY_SMTP_ADDRESS, config=self.exchange_config, autodiscover=False, access_type=exchangelib.DELEGATE)
+                self.tz = exchangelib.EWSTimeZone(self.config.TIMEZONE)
         except:
-            logger.critical('Error occured while trying to set up connection with the exchange server "' + self.config.EXCHANGE_SERVER + '":')
+            self.logger.critical('Error occured while trying to set up connection with the exchange server "' + self.config.EXCHANGE_SERVER + '":')
             raise
 
+    def entry_template(self):
+        """
+        Returns ENTRY_TEMPLATE of the configuration or, if not defined,
+        the template of the default output according to
+        OUTLOOK_HYPERLINK, WRITE_SCHEDULED, WRITE_DEADLINE and
+        WRITE_PROPERTIES_DRAWER. With --verbose, the debug text is
+        appended. See compile_entry_template() for the syntax.
+        """
+
+        template = getattr(self.config, 'ENTRY_TEMPLATE', None)
+
+        if not template:
+            template = '** {timestamp}{ subject}{ (location)}'
+            if len(self.config.OUTLOOK_HYPERLINK) > 1:
+                template += '{ link}'
+            if self.config.WRITE_SCHEDULED:
+                template += '\nSCHEDULED: {date_range}'
+            if self.config.WRITE_DEADLINE:
+                template += '\nDEADLINE: {date_range}'
+            rich_fields = getattr(self.config, 'RICH_FIELDS', [])
+            properties = ''
+            if self.config.WRITE_PROPERTIES_DRAWER:
+                properties += ':ID: {entry_id}\n'
+            if 'organizer' in rich_fields:
+                properties += '{:ORGANIZER: organizer\n}'
+            if 'attendees' in rich_fields:
+                properties += '{:ATTENDEES: attendees\n}'
+            if properties:
+                template += '\n:PROPERTIES:\n' + properties + ':END:\n'
+            else:
+                template += '\n'
+            if 'body' in rich_fields:
+                template += '{body\n}'
+
+        if options.verbose:
+            template += '{debug}'
+
+        return template
+
+    def compile_entry_template(self):
+        """
+        Compiles the entry template into the specialized function
+        self.format_entry() which gets the values of all fields as
+        keyword arguments and returns the Org-mode entry.
+
+        The template contains literal text and fields in curly braces.
+        A field is a field name with optional text before and after
+        the name. This text is only written if the value of the field
+        is not empty. For example, "{ (location)}" results in
+        " (Room 42)" for events with a location and in nothing for
+        events without one. Field names are: timestamp, subject,
+        location, link, entry_id, date_range, debug, organizer,
+        attendees and body.
+
+        Only fields used by the template are computed for each event.
+        Their names are stored in self.entry_template_fields.
+        """
+
+        template = self.entry_template()
+        parts = []
+        position = 0
+        for field in ENTRY_TEMPLATE_FIELD_REGEX.finditer(template):
+            if field.start() > position:
+                parts.append(repr(template[position:field.start()]))
+            before, name, after = field.groups()
+            if before or after:
+                parts.append('(' + repr(before) + ' + ' + name + ' + ' + repr(after) + ' if ' + name + ' else \'\')')
+            else:
+                parts.append(name)
+            position = field.end()
+        if position < len(template):
+            parts.append(repr(template[position:]))
+
+        source = 'def format_entry(' + ', '.join(ENTRY_TEMPLATE_FIELDS) + '):\n' + \
+                 '    return \'\'.join([' + ', '.join(parts) + '])\n'
+        namespace = {}
+        exec(compile(source, '<ENTRY_TEMPLATE>', 'exec'), namespace)
+
+        self.format_entry = namespace['format_entry']
+        self.entry_template_fields = set(field.group(2) for field in ENTRY_TEMPLATE_FIELD_REGEX.finditer(template))
+        # CalendarItem fields which are fetched by fetch_rich_fields():
+        self.rich_item_fields = [item_field for field in sorted(self.entry_template_fields & set(RICH_FIELDS))
+                                 for item_field in RICH_FIELDS[field]]
+        # Debug text is only generated if it is part of the output or if it gets logged:
+        self.write_debugtext = 'debug' in self.entry_template_fields or self.logger.isEnabledFor(logging.DEBUG)
+
+    def calendar_fields(self):
+        """
+        Returns the list of CalendarItem fields which have to be fetched
+        from the server in order to generate the configured output.
+
+        Without such a projection, exchangelib requests all fields of
+        all items (bodies, attendees, reminders, ...) which are
+        discarded by convert_to_orgmode() anyway. Item ID and
+        changekey are always part of the response.
+
+        @param return: list of field names
+        """
+
+        fields = ['subject', 'start', 'end', 'location', 'is_all_day', 'is_cancelled']
+
+        # The following fields are only needed to omit events:
+        if options.include_categories or self.excluded_categories():
+            fields.append('categories')
+        if options.include_organizers or options.exclude_organizers:
+            fields.append('organizer')
+        if options.include_freebusy or options.exclude_freebusy:
+            fields.append('legacy_free_busy_status')
+
+        return fields
+
+    def simple_calendar_fields(self):
+        """
+        Returns the fields of calendar_fields() which the server returns
+        when finding items. exchangelib fetches complex fields like
+        location and categories with an additional GetItem request for
+        each found item. They are fetched by fetch_rich_fields() for
+        the events which are not omitted because of their simple
+        fields instead.
+
+        @param return: list of field names
+        """
+        return [field for field in self.calendar_fields()
+                if not exchangelib.CalendarItem.get_field_by_fieldname(field).is_complex]
+
+    def detail_fields(self):
+        """
+        Returns the fields which fetch_rich_fields() fetches in the
+        second phase: the complex fields of calendar_fields() and the
+        fields of RICH_FIELDS or ENTRY_TEMPLATE.
+
+        @param return: list of field names
+        """
+        return [field for field in self.calendar_fields()
+                if exchangelib.CalendarItem.get_field_by_fieldname(field).is_complex] + self.rich_item_fields
+
+    def excluded_categories(self):
+        """
+        Returns the categories of --exclude-category and --ignore-category.
+        """
+        return (options.exclude_categories or []) + (options.ignore_category or [])
+
+    def category_restriction(self):
+        """
+        Returns the category filters as exchangelib.Q, which is empty
+        without category filters. It applies to all kinds of items.
+
+        @param return: exchangelib.Q
+        """
+
+        restriction = exchangelib.Q()
+        if options.include_categories:
+            restriction &= exchangelib.Q(categories__in=options.include_categories)
+        # Not(IsEqualTo) since IsNotEqualTo matches items with any other category:
+        if self.excluded_categories():
+            restriction &= exchangelib.Q(exchangelib.Q(categories__in=self.excluded_categories()), conn_type=exchangelib.Q.NOT)
+        return restriction
+
+    def server_restriction(self):
+        """
+        Returns the filters of omitted_reason() as exchangelib.Q which
+        restricts the items the server returns when finding items.
+        Calendar views do not support restrictions, and the organizer
+        cannot be restricted, so omitted_reason() still has to be
+        applied to all events.
+
+        @param return: exchangelib.Q
+        """
+
+        restriction = exchangelib.Q(is_cancelled=False) & self.category_restriction()
+        if self.config.OMIT_SUBJECTS:
+            restriction &= ~exchangelib.Q(subject__in=self.config.OMIT_SUBJECTS)
+        if options.include_freebusy:
+            restriction &= exchangelib.Q(legacy_free_busy_status__in=options.include_freebusy)
+        if options.exclude_freebusy:
+            restriction &= exchangelib.Q(exchangelib.Q(legacy_free_busy_status__in=options.exclude_freebusy),
+                                         conn_type=exchangelib.Q.NOT)
+        return restriction
+
     def convert_itemid_from_exchange_to_entryid_for_outlook(self, itemid):
         """
         Converts the string of the ItemID we got from the exchange server to the
@@ -195,240 +938,2658 @@ class Exchange2Org(object):
         else:
             return d.astimezone(self.tz)
 
-    def convert_to_orgmode(self, event):
+    def omitted_reason(self, event, details=False):
+        """
+        Returns why an event is omitted in the output or None.
+
+        @param event: an Exchange calendar event
+        @param details: boolean whether to check the filters of the
+                        complex fields categories and organizer instead
+                        of the filters of the simple fields
+        @param return: 'cancelled', 'omit_subjects', 'freebusy', 'category', 'organizer' or None
+        """
+
+        if not details:
+            if event.is_cancelled:
+                return 'cancelled'
+            if event.subject in self.config.OMIT_SUBJECTS:
+                return 'omit_subjects'
+            if options.include_freebusy and event.legacy_free_busy_status not in options.include_freebusy:
+                return 'freebusy'
+            if options.exclude_freebusy and event.legacy_free_busy_status in options.exclude_freebusy:
+                return 'freebusy'
+            return None
+
+        excluded_categories = self.excluded_categories()
+        if options.include_categories or excluded_categories:
+            # Like Exchange, compare categories case-insensitively:
+            categories = set(category.lower() for category in event.categories or [])
+            if options.include_categories and not categories & set(category.lower() for category in options.include_categories):
+                return 'category'
+            if categories & set(category.lower() for category in excluded_categories):
+                return 'category'
+
+        if options.include_organizers or options.exclude_organizers:
+            organizer = event.organizer
+            if self.organizer_omitted(organizer and organizer.name, organizer and organizer.email_address):
+                return 'organizer'
+
+        return None
+
+    def organizer_omitted(self, name, email_address):
+        """
+        Returns whether an organizer or a sender is omitted by
+        --include-organizer and --exclude-organizer.
+
+        @param name: name or None
+        @param email_address: e-mail address or None
+        @param return: boolean
+        """
+
+        names = set(value.lower() for value in [name, email_address] if value)
+        if options.include_organizers and not names & set(value.lower() for value in options.include_organizers):
+            return True
+        if options.exclude_organizers and names & set(value.lower() for value in options.exclude_organizers):
+            return True
+        return False
+
+    def convert_to_orgmode(self, event, repeater=None):
         """
         Gets a calendar event and returns its representation in Org-mode format.
 
         @param event: an Exchange calendar event
+        @param repeater: optional Org-mode repeater like '+1w' for events which
+                         start and end on the same day or last one whole day
         @param return: string containing a heading with a representation of the calendar event
         """
 
         subject = event.subject
 
-        if event.is_cancelled or \
-           event.subject in self.config.OMIT_SUBJECTS:
+        if statistics:
+            statistics.count('seen')
+
+        omitted = self.omitted_reason(event)
+        if omitted:
+            if statistics:
+                statistics.count(omitted)
             return False
 
-        if event.categories and options.ignore_category:
-            if options.ignore_category[0] in event.categories:
-                return False
+        # Repeaters and locally expanded occurrences (without changekey) are not cached:
+        use_render_cache = self.render_cache is not None and event.changekey and not repeater
+
+        if use_render_cache:
+            cached = self.render_cache.pop(event.id, None)
+            if cached and cached['changekey'] == event.changekey:
+                # re-insert to mark it as recently used:
+                self.render_cache[event.id] = cached
+                return cached['entry']
+
+        # Events of the render cache passed the filters of their details when they
+        # were cached. Their details are not fetched, so they are not checked again:
+        omitted = self.omitted_reason(event, details=True)
+        if omitted:
+            if statistics:
+                statistics.count(omitted)
+            return False
 
         event_start = self.ewsdate_to_ewsdatetime_with_tz(event.start)
         event_end = self.ewsdate_to_ewsdatetime_with_tz(event.end)
-        start_day = event_start.ewsformat()[:10]
-        start_time = event_start.ewsformat()[11:16]
-        end_day = event_end.ewsformat()[:10]
-        end_time = event_end.ewsformat()[11:16]
-        entry_id = self.convert_itemid_from_exchange_to_entryid_for_outlook(str(event.id))
-        #entry_id = event.item_id  # until I found a working version for Python 3 of the function above
+        start_string = event_start.ewsformat()  # example: '2017-09-13T09:30:00+02:00'
+        end_string = event_end.ewsformat()
+        start_day = start_string[:10]
+        start_time = start_string[11:16]
+        end_day = end_string[:10]
+        end_time = end_string[11:16]
+        fields = self.entry_template_fields
+
+        if 'entry_id' in fields or 'link' in fields or self.write_debugtext:
+            entry_id = self.convert_itemid_from_exchange_to_entryid_for_outlook(str(event.id))
+            #entry_id = event.item_id  # until I found a working version for Python 3 of the function above
+        else:
+            entry_id = None
 
         if event.is_all_day:
             assert(end_time == '00:00')
             # When is_all_day is true, the end day is midnight after
             # the end day. I want to correct this to the end day which
             # is affected of the event instead:
-            end_day_datetime = day_string_to_datetime(end_day)
-            end_day_datetime = end_day_datetime + datetime.timedelta(days=-1)
-            new_end_day = end_day_datetime.strftime('%Y-%m-%d')
-            self.logger.debug('is_all_day: I moved end_day from ' + end_day + ' to ' + new_end_day)
+            new_end_day = (event_end.date() + datetime.timedelta(days=-1)).strftime('%Y-%m-%d')
+            if self.write_debugtext:
+                self.logger.debug('is_all_day: I moved end_day from ' + end_day + ' to ' + new_end_day)
             end_day = new_end_day
 
-        debugtext = []
-        debugtext.append('start:' + event_start.ewsformat())  # example: '2017-09-13T09:30:00+02:00'
-        debugtext.append('start_day:' + start_day)
-        debugtext.append('start_time:' + start_time)
-        debugtext.append('end: ' + event_end.ewsformat())
-        debugtext.append('end_day:' + end_day)
-        debugtext.append('end_time:' + end_time)
-        debugtext.append('subject: ' + event.subject)
-        debugtext.append('item_id: ' + event.id)
-        debugtext.append('entry_id: ' + entry_id)
-        debugtext.append('is_all_day: ' + repr(event.is_all_day)) # =False
-        if event.location:
-            debugtext.append('location: ' + event.location)  #=None,
-        else:
-            debugtext.append('(no location)')
-        debugtext.append('is_cancelled: ' + repr(event.is_cancelled))  #=False,
-
-        self.logger.debug('=' * 80 + '\n' + '\n'.join(debugtext))
+        debug = ''
+        if self.write_debugtext:
+            debugtext = []
+            debugtext.append('start:' + start_string)
+            debugtext.append('start_day:' + start_day)
+            debugtext.append('start_time:' + start_time)
+            debugtext.append('end: ' + end_string)
+            debugtext.append('end_day:' + end_day)
+            debugtext.append('end_time:' + end_time)
+            debugtext.append('subject: ' + event.subject)
+            debugtext.append('item_id: ' + event.id)
+            debugtext.append('entry_id: ' + entry_id)
+            debugtext.append('is_all_day: ' + repr(event.is_all_day)) # =False
+            if event.location:
+                debugtext.append('location: ' + event.location)  #=None,
+            else:
+                debugtext.append('(no location)')
+            debugtext.append('is_cancelled: ' + repr(event.is_cancelled))  #=False,
 
-        output = '** <' + start_day
+            self.logger.debug('=' * 80 + '\n' + '\n'.join(debugtext))
+            debug = ': ' + '\n: '.join(debugtext) + '\n'
 
         if event.is_all_day:
             if start_day == end_day:
-                output += '>'
-            elif start_day != end_day:
-                output += '>-<' + end_day + '>'
+                timestamp = '<' + start_day + '>'
             else:
-                error_exit(10, 'convert_to_orgmode found a day/time combination which is not implemented yet (is_all_day)')
+                timestamp = '<' + start_day + '>-<' + end_day + '>'
         elif start_day == end_day:
             if start_time == end_time:
-                output += ' ' + start_time + '>'
+                timestamp = '<' + start_day + ' ' + start_time + '>'
             else:
-                output += ' ' + start_time + '-' + end_time + '>'
-        elif start_day != end_day:
-            output += ' ' + start_time + '>-<' + end_day + ' ' + end_time + '>'
+                timestamp = '<' + start_day + ' ' + start_time + '-' + end_time + '>'
         else:
-            error_exit(11, 'convert_to_orgmode found a day/time combination which is not implemented yet')
-
-        if subject:
-            output += ' ' + subject
-
-        if event.location:
-            output += ' (' + event.location + ')'
+            timestamp = '<' + start_day + ' ' + start_time + '>-<' + end_day + ' ' + end_time + '>'
 
-        if len(self.config.OUTLOOK_HYPERLINK) > 1:
-            output += ' [[outlook:' + entry_id + '][⦿]]'
-
-        if self.config.WRITE_SCHEDULED:
-            output += "\nSCHEDULED: "
-            output += self.generate_orgmode_date_range(event)
+        if repeater:
+            timestamp = timestamp[:-1] + ' ' + repeater + '>'
 
-        if self.config.WRITE_DEADLINE:
-            output += "\nDEADLINE: "
-            output += self.generate_orgmode_date_range(event)
-
-        if self.config.WRITE_PROPERTIES_DRAWER:
-            output += '\n:PROPERTIES:\n:ID: ' + entry_id + '\n:END:\n'
+        if 'date_range' in fields:
+            date_range = self.generate_orgmode_date_range(event_start, event_end, repeater)
         else:
-            output += '\n'
-
-        if options.verbose:
-            output += ': ' + '\n: '.join(debugtext) + '\n'
+            date_range = None
+
+        if self.rich_item_fields:
+            organizer = 'organizer' in fields and mailbox_name(event.organizer)
+            attendees = 'attendees' in fields and ', '.join(
+                mailbox_name(attendee.mailbox) for attendee in
+                (event.required_attendees or []) + (event.optional_attendees or []) if attendee.mailbox)
+            body = 'body' in fields and body_to_org(event.body)
+        else:
+            organizer = attendees = body = None
+
+        output = self.format_entry(timestamp=timestamp,
+                                   subject=subject,
+                                   location=event.location,
+                                   link=entry_id and '[[outlook:' + entry_id + '][⦿]]',
+                                   entry_id=entry_id,
+                                   date_range=date_range,
+                                   debug=debug,
+                                   organizer=organizer,
+                                   attendees=attendees,
+                                   body=body)
+
+        if use_render_cache:
+            self.render_cache[event.id] = {'changekey': event.changekey,
+                                           'start': event_start.timestamp(),
+                                           'end': event_end.timestamp(),
+                                           'entry': output}
 
         return output
 
 
-    def generate_orgmode_date_range(self, event):
+    def generate_orgmode_date_range(self, start, end, repeater=None):
         """
-        Generates a org mode compatible time range from a calendar event
+        Generates a org mode compatible time range from the start and
+        the end of a calendar event
+
+        @param start: EWSDateTime of the start, converted to the time zone
+        @param end: EWSDateTime of the end, converted to the time zone
+        @param repeater: optional Org-mode repeater like '+1w'. Events with
+                         repeaters either start and end on the same day or
+                         last one whole day.
         """
-        result =  ""
-        start_day = self.ewsdate_to_ewsdatetime_with_tz(event.start).astimezone(self.tz)
-        end_day = self.ewsdate_to_ewsdatetime_with_tz(event.end).astimezone(self.tz)
-        if start_day.date() == end_day.date():
-            result += "<" + start_day.strftime("%Y-%m-%d %a %H:%M-") + end_day.strftime("%H:%M") + ">"
+        if repeater:
+            if start.date() == end.date():
+                return "<" + start.strftime("%Y-%m-%d %a %H:%M-") + end.strftime("%H:%M") + " " + repeater + ">"
+            # all-day event:
+            return "<" + start.strftime("%Y-%m-%d %a") + " " + repeater + ">"
+        elif start.date() == end.date():
+            return "<" + start.strftime("%Y-%m-%d %a %H:%M-") + end.strftime("%H:%M") + ">"
         else:
-            result += "<" + start_day.strftime("%Y-%m-%d %a %H:%M") + ">--<" + end_day.strftime("%Y-%m-%d %a %H:%M") + ">"
-        return result
+            return "<" + start.strftime("%Y-%m-%d %a %H:%M") + ">--<" + end.strftime("%Y-%m-%d %a %H:%M") + ">"
 
-    def dump_calendar(self, startday, endday):
+    def orgfile_header(self, title='Calendar events'):
         """
-        Retrieves Exchange calendar data from the server and writes output file.
+        Returns the Org-mode header of output files with optional tags and category.
 
-        @param startday: list of year, month, day as integers
-        @param endday: list of year, month, day as integers
+        @param title: kind of the entries like 'Calendar events' or 'Tasks'
         """
 
-        number_of_events = 0
-        outputfilename = options.outputfile[0]
+        header = ('# -*- mode: org; coding: utf-8; -*-\n* ' + title + ' of "' +
+                  self.config.USERNAME.replace('\\', '\\\\') + '" from "' + self.config.EXCHANGE_SERVER +
+                  '"  ·•·  Generated via ' + sys.argv[0] + ' at ' +
+                  datetime.datetime.now().strftime('%Y-%m-%dT%H:%M:%S'))
+        if len(self.config.TAGS) > 0:
+            header += ' ' * 10 + ':' + ':'.join(self.config.TAGS) + ':'
+        if len(self.config.CATEGORY) > 0:
+            header += '\n:PROPERTIES:\n:CATEGORY: ' + self.config.CATEGORY + '\n:END:\n'
+        else:
+            header += '\n'
 
-        # Fetch all calendar events from the Exchange server:
-        start_dt = exchangelib.EWSDateTime(*startday).replace(tzinfo=self.tz)
-        end_dt = exchangelib.EWSDateTime(*endday).replace(tzinfo=self.tz)
-        events = self.account.calendar.view(start=start_dt, end=end_dt)
-
-        with open(outputfilename, 'w') as outputhandle:
-
-            # Write Org-mode header with optional tags and category:
-            if not options.dryrun:
-                outputhandle.write('# -*- mode: org; coding: utf-8; -*-\n* Calendar events of "' +
-                                   self.config.USERNAME.replace('\\', '\\\\') + '" from "' + self.config.EXCHANGE_SERVER +
-                                   '"  ·•·  Generated via ' + sys.argv[0] + ' at ' +
-                                   datetime.datetime.now().strftime('%Y-%m-%dT%H:%M:%S'))
-                if len(self.config.TAGS) > 0:
-                    outputhandle.write(' ' * 10 + ':' + ':'.join(self.config.TAGS) + ':')
-                if len(self.config.CATEGORY) > 0:
-                    outputhandle.write('\n:PROPERTIES:\n:CATEGORY: ' + self.config.CATEGORY + '\n:END:\n')
-                else:
-                    outputhandle.write('\n')
+        return header
 
-            # Loop over all events from the Exchange server:
-            for event in events:
-                output = self.convert_to_orgmode(event)
-                if output:
-                    number_of_events += 1
-                    if not options.dryrun:
-                        outputhandle.write(output)
+    def write_orgfile(self, outputfilename, entries, title='Calendar events'):
+        """
+        Writes the Org-mode header, all entries and the footer to the output file.
 
-            if not options.dryrun:
-                outputhandle.write('\n\n# Local Variables:\n# mode: auto-revert\n# End:\n')
+        The output file is only replaced when its content changed,
+        ignoring the time-stamp of the header. See write_file_if_changed().
+        In dryrun mode, the entries are only counted.
 
-        self.logger.info(str(number_of_events) + ' events were written to ' + outputfilename)
+        @param outputfilename: name of the output file
+        @param entries: iterable of strings containing Org-mode entries
+        @param title: title of the header, see orgfile_header()
+        @param return: tuple of number of entries written and boolean whether the output file changed
+        """
 
+        number_of_events = 0
 
-def handle_date_or_period_argument(daystring, future):
-    """
-    Gets a string containing either a 'YYYY-MM-DD' ISO day format
-    or an integer. Returns a list of year, month, day of the ISO day
-    or (in case of an integer) a similar list with number of days in
-    the past or the future - according to the 2nd parameter.
+        if options.dryrun:
+            for output in entries:
+                number_of_events += 1
+            return number_of_events, False
 
-    @param daystring: string with either 'YYYY-MM-DD' format or an integer
-    @param furure: boolean
-    @param endday: list of year, month, day as integers
-    """
+        def write(outputhandle):
+            nonlocal number_of_events
+            outputhandle.write(self.orgfile_header(title))
+            for output in entries:
+                number_of_events += 1
+                outputhandle.write(output)
+            outputhandle.write(ORGFILE_FOOTER)
 
-    # check format: integer or ISO date string?
-    components = re.match(DAY_STRING_REGEX, daystring)
-    if components:
-        # parameter was of format YYYY-MM-DD
-        return [int(components.group(1)), int(components.group(2)), int(components.group(3))]
-    else:
-        # parameter might be an integer:
-        try:
-            number_of_days = int(daystring)
-        except:
-            error_exit(2, 'Format of daystring parameter must be "YYYY-MM-DD" or an integer.')
-        if future:
-            delta_days = number_of_days
-        else:
-            delta_days = -number_of_days
-        daystring_datetime = datetime.datetime.now() + datetime.timedelta(days=delta_days)
-        return [daystring_datetime.year, daystring_datetime.month, daystring_datetime.day]
+        changed = write_file_if_changed(outputfilename, write)
 
+        return number_of_events, changed
 
-def main():
-    """Main function"""
+    def split_time_range(self, start_dt, end_dt, window):
+        """
+        Splits a time range into consecutive sub-ranges which end at the
+        start of a week (Monday) or a month.
 
-    handle_logging()
+        @param start_dt: EWSDateTime of the start of the time range
+        @param end_dt: EWSDateTime of the end of the time range
+        @param window: 'week' or 'month'
+        @param return: list of tuples of EWSDateTime with start and end of the sub-ranges
+        """
 
-    if options.verbose and options.quiet:
-        error_exit(1, "Options \"--verbose\" and \"--quiet\" found. " +
-                   "This does not make any sense, you silly fool :-)")
+        ranges = []
+        range_start = start_dt
+        while range_start < end_dt:
+            if window == 'week':
+                boundary = range_start.date() + datetime.timedelta(days=7 - range_start.weekday())
+            else:
+                if range_start.month == 12:
+                    boundary = datetime.date(range_start.year + 1, 1, 1)
+                else:
+                    boundary = datetime.date(range_start.year, range_start.month + 1, 1)
+            range_end = min(exchangelib.EWSDateTime(boundary.year, boundary.month, boundary.day).replace(tzinfo=self.tz),
+                            end_dt)
+            ranges.append((range_start, range_end))
+            range_start = range_end
 
-    # The defaults are: ±60 days
-    before_60_days = datetime.datetime.now() + datetime.timedelta(days=-60)
-    startday = [before_60_days.year, before_60_days.month, before_60_days.day]
-    in_60_days = datetime.datetime.now() + datetime.timedelta(days=60)
-    endday = [in_60_days.year, in_60_days.month, in_60_days.day]
+        return ranges
 
-    if options.startday:
-        startday = handle_date_or_period_argument(options.startday[0], future=False)
-        logging.debug('options.startday found and set to ' + repr(startday))
-    if options.endday:
-        endday = handle_date_or_period_argument(options.endday[0], future=True)
-        logging.debug('options.endday found and set to ' + repr(endday))
+    def calendar_view(self, start_dt, end_dt):
+        """
+        Returns the query of all calendar events of the time range with
+        the fields of simple_calendar_fields() and the page size of
+        --page-size.
 
-    if options.dryrun:
-        logging.debug("DRYRUN active, not changing any files")
+        @param start_dt: EWSDateTime of the start of the time range
+        @param end_dt: EWSDateTime of the end of the time range
+        """
 
-    logging.debug('Looking for the configuration file which is expected to be found on a hard-coded path')
-    CONFIGDIR = os.path.join(os.path.expanduser("~"), ".config/exchange2org")
-    sys.path.insert(0, CONFIGDIR)  # add CONFIGDIR to Python path in order to find config file
-    try:
-        import exchange2orgconfig
-    except ImportError:
-        print('Could not find file  "' + os.path.join(CONFIGDIR, 'exchange2orgconfig.py') + '".' +
+        query = self.account.calendar.view(start=start_dt, end=end_dt).only(*self.simple_calendar_fields())
+        if options.page_size:
+            query.page_size = options.page_size
+        return query
+
+    def prefetch_pages(self, events, depth):
+        """
+        Iterates over the events in a background thread which fetches
+        up to depth pages ahead into a bounded queue. The caller
+        converts and writes the events of one page while the next pages
+        are fetched. The order of the events is not changed. Exceptions
+        of the background thread are raised in the caller.
+
+        @param events: iterable of Exchange calendar events which fetches pages on demand
+        @param depth: maximum number of pages in the queue
+        @param return: generator of Exchange calendar events
+        """
+
+        page_size = options.page_size or 100
+        pages = queue.Queue(maxsize=depth)
+        stopped = threading.Event()
+
+        def put(page):
+            # gives up when the caller stopped iterating:
+            while not stopped.is_set():
+                try:
+                    pages.put(page, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+
+        def fetch():
+            try:
+                iterator = iter(events)
+                while not stopped.is_set():
+                    page = list(itertools.islice(iterator, page_size))
+                    if not page:
+                        break
+                    put(page)
+                put(None)
+            except Exception as e:
+                put(e)
+
+        fetcher = threading.Thread(target=fetch, name='prefetch', daemon=True)
+        fetcher.start()
+        try:
+            while True:
+                page = pages.get()
+                if page is None:
+                    return
+                if isinstance(page, Exception):
+                    raise page
+                yield from page
+        finally:
+            stopped.set()
+
+    def fetch_calendar_events(self, start_dt, end_dt):
+        """
+        Fetches all calendar events of the time range from the server.
+
+        Without --fetch-window, the pages are prefetched in the
+        background according to --prefetch.
+
+        With --fetch-window, the time range is split into sub-ranges
+        which are fetched concurrently. The results are merged in
+        chronological order. Events which overlap the boundary of two
+        sub-ranges are returned by both and get deduplicated by their
+        item ID.
+
+        @param start_dt: EWSDateTime of the start of the time range
+        @param end_dt: EWSDateTime of the end of the time range
+        @param return: iterable of EventRecord
+        """
+
+        if not options.fetch_window:
+            # The events of the pages are snapshotted by the prefetching thread:
+            events = map(EventRecord, self.calendar_view(start_dt, end_dt))
+            if options.prefetch > 0:
+                return self.prefetch_pages(events, options.prefetch)
+            return events
+
+        def fetch_range(time_range):
+            range_start, range_end = time_range
+            self.logger.debug('fetching events from ' + range_start.ewsformat() + ' to ' + range_end.ewsformat())
+            return [EventRecord(event) for event in self.calendar_view(range_start, range_end)]
+
+        import concurrent.futures
+        ranges = self.split_time_range(start_dt, end_dt, options.fetch_window)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, options.fetch_workers)) as executor:
+            # map() returns the results in the order of the sub-ranges:
+            results = list(executor.map(fetch_range, ranges))
+
+        events = []
+        seen_ids = set()
+        for range_events in results:
+            for event in range_events:
+                if event.id not in seen_ids:
+                    seen_ids.add(event.id)
+                    events.append(event)
+
+        return events
+
+    def fetch_rich_fields(self, events, fields=None):
+        """
+        Fetches the details of events in a second phase and yields the
+        events in the same order. Details are the complex fields of
+        calendar_fields() like the location and the fields of
+        RICH_FIELDS or ENTRY_TEMPLATE like the body.
+
+        The details are only fetched for events which are not omitted
+        because of their simple fields and whose Org-mode entry is not
+        in the render cache, so the cost depends on the number of
+        written events instead of the number of fetched events. They
+        are fetched by batched GetItem requests of --rich-batch-size
+        events. Up to --rich-workers requests are running concurrently
+        while the previous events are converted.
+
+        @param events: iterable of Exchange calendar events with the fields of simple_calendar_fields()
+        @param fields: list of fields to fetch, by default detail_fields()
+        @param return: generator of Exchange calendar events
+        """
+
+        if fields is None:
+            fields = self.detail_fields()
+        if not fields:
+            yield from events
+            return
+
+        def needs_rich_fields(event):
+            if not event.changekey or self.omitted_reason(event):
+                return False
+            cached = self.render_cache and self.render_cache.get(event.id)
+            return not (cached and cached['changekey'] == event.changekey)
+
+        def fetch(batch):
+            return list(self.account.fetch(ids=[(event.id, event.changekey) for event in batch], only_fields=fields))
+
+        def complete(chunk, batch, future):
+            # waits for the batch and copies its fields to the events of the chunk:
+            for event, item in zip(batch, future.result() if future else []):
+                if isinstance(item, Exception):
+                    self.logger.warning('Could not fetch ' + ', '.join(fields) + ' of "' + str(event.subject) + '": ' + repr(item))
+                    continue
+                for field in fields:
+                    setattr(event, field, getattr(item, field))
+            if statistics:
+                statistics.count('details', len(batch))
+            return chunk
+
+        import concurrent.futures
+        batch_size = max(1, options.rich_batch_size)
+        workers = max(1, options.rich_workers)
+        pending = collections.deque()
+        chunk = []
+        batch = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            for event in events:
+                chunk.append(event)
+                if needs_rich_fields(event):
+                    batch.append(event)
+                if len(batch) >= batch_size:
+                    pending.append((chunk, batch, executor.submit(fetch, batch)))
+                    chunk, batch = [], []
+                    if len(pending) > workers:
+                        yield from complete(*pending.popleft())
+            if batch or chunk:
+                pending.append((chunk, batch, executor.submit(fetch, batch) if batch else None))
+            while pending:
+                yield from complete(*pending.popleft())
+
+    def fetch_calendar_entries(self, start_dt, end_dt):
+        """
+        Fetches all calendar events of the time range from the server and
+        yields their Org-mode representation.
+
+        @param start_dt: EWSDateTime of the start of the time range
+        @param end_dt: EWSDateTime of the end of the time range
+        """
+
+        return self.render_events(self.fetch_rich_fields(self.fetch_calendar_events(start_dt, end_dt)))
+
+    def render_events(self, events):
+        """
+        Converts events to Org-mode entries and yields the entries of
+        the events which are not omitted in the order of the events.
+
+        With --render-workers, chunks of RENDER_CHUNK_SIZE events are
+        converted by a pool of processes. At most two chunks per process
+        are pending, so the memory usage does not depend on the number
+        of events. The processes are started before the first event is
+        requested, that is, before the threads fetching the events are
+        started, because processes are forked on most platforms.
+
+        @param events: iterable of EventRecord
+        @param return: generator of strings containing Org-mode entries
+        """
+
+        if options.render_workers <= 1:
+            for event in events:
+                output = self.convert_to_orgmode(event)
+                if output:
+                    yield output
+            return
+
+        import concurrent.futures
+        # The configuration module can not be pickled:
+        config = types.SimpleNamespace(**{name: value for name, value in vars(self.config).items() if name.isupper()})
+        with concurrent.futures.ProcessPoolExecutor(max_workers=options.render_workers, initializer=init_render_worker,
+                                                    initargs=(config, options, statistics is not None)) as executor:
+            # starts all processes:
+            for future in [executor.submit(int) for worker in range(options.render_workers)]:
+                future.result()
+
+            def completed(future):
+                with statistics_phase('convert'):
+                    outputs, counters = future.result()
+                if statistics:
+                    for name, number in counters.items():
+                        statistics.count(name, number)
+                return [output for output in outputs if output]
+
+            pending = collections.deque()
+            events = iter(events)
+            while True:
+                chunk = list(itertools.islice(events, RENDER_CHUNK_SIZE))
+                if not chunk:
+                    break
+                pending.append(executor.submit(render_chunk, chunk))
+                if len(pending) >= 2 * options.render_workers:
+                    yield from completed(pending.popleft())
+            while pending:
+                yield from completed(pending.popleft())
+
+    def recurrence_repeater(self, master):
+        """
+        Returns the Org-mode repeater of a recurring series if its
+        pattern can be expressed by one: every n days, every n weeks on
+        one weekday, every n months on a day which exists in every
+        month, or every year. The series must not end and each
+        occurrence has to start and end on the same day or last one
+        whole day.
+
+        @param master: the recurring master of the series
+        @param return: string like '+1w' or None
+        """
+
+        recurrence = master.recurrence
+        pattern = recurrence.pattern
+        pattern_name = type(pattern).__name__
+
+        if type(recurrence.boundary).__name__ != 'NoEndPattern':
+            return None
+
+        start = self.ewsdate_to_ewsdatetime_with_tz(master.start)
+        end = self.ewsdate_to_ewsdatetime_with_tz(master.end)
+        if master.is_all_day:
+            if end.date() - start.date() != datetime.timedelta(days=1):
+                return None
+        elif start.date() != end.date():
+            return None
+
+        if pattern_name == 'DailyPattern':
+            return '+' + str(pattern.interval) + 'd'
+        elif pattern_name == 'WeeklyPattern' and len(pattern.weekdays) == 1:
+            return '+' + str(pattern.interval) + 'w'
+        elif pattern_name == 'AbsoluteMonthlyPattern' and pattern.day_of_month <= 28:
+            return '+' + str(pattern.interval) + 'm'
+        elif pattern_name == 'AbsoluteYearlyPattern' and (pattern.month, pattern.day_of_month) != (2, 29):
+            return '+1y'
+
+        return None
+
+    def relative_day_of_month(self, year, month, weekday, week_number):
+        """
+        Returns the day of a relative recurrence like "the second
+        Tuesday" or "the last weekend day" of a month.
+
+        @param weekday: 1 (Monday) to 7 (Sunday), 8 (day), 9 (weekday) or 10 (weekend day)
+        @param week_number: 1 (first) to 4 (fourth) or 5 (last)
+        @param return: datetime.date
+        """
+
+        days = [datetime.date(year, month, day) for day in range(1, calendar.monthrange(year, month)[1] + 1)]
+        if weekday <= 7:
+            days = [day for day in days if day.isoweekday() == weekday]
+        elif weekday == 9:
+            days = [day for day in days if day.isoweekday() <= 5]
+        elif weekday == 10:
+            days = [day for day in days if day.isoweekday() > 5]
+
+        if week_number == 5:
+            return days[-1]
+        return days[week_number - 1]
+
+    def recurrence_days(self, recurrence, first_day):
+        """
+        Generates the days of all occurrences of a recurring series in
+        chronological order, regardless of deleted or modified
+        occurrences. The days follow the recurrence pattern and stop
+        at the end of the series.
+
+        @param recurrence: the exchangelib Recurrence of the series
+        @param first_day: datetime.date of the first occurrence
+        @param return: generator of datetime.date
+        """
+
+        pattern = recurrence.pattern
+        pattern_name = type(pattern).__name__
+
+        def pattern_days():
+            if pattern_name == 'DailyPattern':
+                day = first_day
+                while True:
+                    yield day
+                    day += datetime.timedelta(days=pattern.interval)
+            elif pattern_name == 'WeeklyPattern':
+                # days of the week relative to the first day of the week:
+                offsets = sorted((weekday - pattern.first_day_of_week) % 7 for weekday in pattern.weekdays)
+                week_start = first_day - datetime.timedelta(days=(first_day.isoweekday() - pattern.first_day_of_week) % 7)
+                while True:
+                    for offset in offsets:
+                        day = week_start + datetime.timedelta(days=offset)
+                        if day >= first_day:
+                            yield day
+                    week_start += datetime.timedelta(weeks=pattern.interval)
+            elif pattern_name in ['AbsoluteMonthlyPattern', 'RelativeMonthlyPattern',
+                                  'AbsoluteYearlyPattern', 'RelativeYearlyPattern']:
+                if pattern_name.endswith('YearlyPattern'):
+                    year, month, interval = first_day.year, pattern.month, 12
+                else:
+                    year, month, interval = first_day.year, first_day.month, pattern.interval
+                while True:
+                    if pattern_name.startswith('Absolute'):
+                        # months without this day use their last day:
+                        day = datetime.date(year, month, min(pattern.day_of_month, calendar.monthrange(year, month)[1]))
+                    else:
+                        day = self.relative_day_of_month(year, month, pattern.weekday, pattern.week_number)
+                    if day >= first_day:
+                        yield day
+                    year, month = year + (month - 1 + interval) // 12, (month - 1 + interval) % 12 + 1
+            else:
+                raise ValueError('unsupported recurrence pattern ' + pattern_name)
+
+        boundary = recurrence.boundary
+        boundary_name = type(boundary).__name__
+        for number, day in enumerate(pattern_days()):
+            if boundary_name == 'EndDatePattern' and day > boundary.end:
+                return
+            if boundary_name == 'NumberedPattern' and number >= boundary.number:
+                return
+            yield day
+
+    def expand_recurring_series(self, master, start_dt, end_dt):
+        """
+        Expands a recurring series locally to Org-mode entries of the
+        time range. For series which can be expressed by an Org-mode
+        repeater, the occurrences after the last deleted or modified
+        occurrence become a single entry with a repeater. All other
+        occurrences of the time range become separate entries. Modified
+        occurrences are fetched from the server and rendered with
+        their modified data.
+
+        @param master: the recurring master of the series
+        @param start_dt: EWSDateTime of the start of the time range
+        @param end_dt: EWSDateTime of the end of the time range
+        @param return: list of tuples of start timestamp and Org-mode entry
+        """
+
+        def local_key(d):
+            # original starts of exceptions are identified by their local date and time:
+            return self.ewsdate_to_ewsdatetime_with_tz(d).replace(tzinfo=None)
+
+        first_start = self.ewsdate_to_ewsdatetime_with_tz(master.start)
+        duration = self.ewsdate_to_ewsdatetime_with_tz(master.end) - first_start
+        deleted = set(local_key(occurrence.start) for occurrence in master.deleted_occurrences or [])
+        modified = {local_key(occurrence.original_start): occurrence for occurrence in master.modified_occurrences or []}
+        last_exception = max(deleted | set(modified), default=None)
+        repeater = self.recurrence_repeater(master)
+
+        entries = []
+        # Occurrences get the rich fields of the master:
+        fields = self.calendar_fields() + self.rich_item_fields
+        modified_ids = []
+        for day in self.recurrence_days(master.recurrence, first_start.date()):
+            local_start = datetime.datetime.combine(day, first_start.time())
+            start = exchangelib.EWSDateTime.from_datetime(local_start.replace(tzinfo=self.tz))
+            if start >= end_dt:
+                break
+            if local_start in deleted:
+                continue
+            if local_start in modified:
+                modified_ids.append((modified[local_start].id, modified[local_start].changekey))
+                continue
+            if start + duration < start_dt:
+                continue
+
+            occurrence = EventRecord(master)
+            occurrence.changekey = None
+            if master.is_all_day:
+                occurrence.start = exchangelib.EWSDate.from_date(day)
+                occurrence.end = exchangelib.EWSDate.from_date(day + datetime.timedelta(days=duration.days))
+            else:
+                occurrence.start = start
+                occurrence.end = start + duration
+
+            if repeater and (last_exception is None or local_start > last_exception):
+                # all further occurrences are covered by the repeater:
+                entries.append((start.timestamp(), self.convert_to_orgmode(occurrence, repeater=repeater)))
+                break
+            entries.append((start.timestamp(), self.convert_to_orgmode(occurrence)))
+
+        # Modified occurrences may have been moved, e.g., into the time range:
+        for occurrence in modified.values():
+            if self.event_timestamp(occurrence.end) >= start_dt.timestamp() and \
+               self.event_timestamp(occurrence.start) < end_dt.timestamp() and \
+               (occurrence.id, occurrence.changekey) not in modified_ids:
+                modified_ids.append((occurrence.id, occurrence.changekey))
+        if modified_ids:
+            for event in self.account.fetch(ids=modified_ids, only_fields=fields):
+                if isinstance(event, Exception):
+                    self.logger.warning('Could not fetch a modified occurrence of "' + str(master.subject) + '": ' + repr(event))
+                    continue
+                if self.event_timestamp(event.end) >= start_dt.timestamp() and \
+                   self.event_timestamp(event.start) < end_dt.timestamp():
+                    entries.append((self.event_timestamp(event.start), self.convert_to_orgmode(event)))
+
+        return entries
+
+    def fetch_calendar_entries_with_repeaters(self, start_dt, end_dt):
+        """
+        Fetches single events of the time range and the masters of
+        recurring series instead of letting the server expand every
+        occurrence. Series are expanded locally by
+        expand_recurring_series(). Series with patterns which cannot
+        be expanded locally are fetched as occurrences from a calendar
+        view: its FindItem requests return the UIDs of all events of the
+        time range, and only the details of the occurrences of these
+        series are fetched.
+
+        Unlike calendar views, these queries support restrictions, so
+        events omitted by the filters of server_restriction() are not
+        returned by the server at all. Filters of series apply to all
+        of their occurrences.
+
+        @param start_dt: EWSDateTime of the start of the time range
+        @param end_dt: EWSDateTime of the end of the time range
+        @param return: list of strings containing Org-mode entries in chronological order
+        """
+
+        fields = self.calendar_fields()
+        restriction = self.server_restriction()
+        entries = []
+
+        single_query = {'type': 'Single', 'start__lt': end_dt, 'end__gte': start_dt}
+        number_of_singles = 0
+        singles = self.account.calendar.filter(restriction, **single_query).only(*self.simple_calendar_fields())
+        for event in self.fetch_rich_fields(singles):
+            number_of_singles += 1
+            entries.append((self.event_timestamp(event.start), self.convert_to_orgmode(event)))
+
+        master_query = {'type': 'RecurringMaster', 'start__lt': end_dt}
+        masters = self.account.calendar.filter(restriction, **master_query).only(
+            *(fields + self.rich_item_fields + ['recurrence', 'modified_occurrences', 'deleted_occurrences', 'uid']))
+        unsupported_uids = set()
+        number_of_series = 0
+        for master in masters:
+            number_of_series += 1
+            try:
+                entries.extend(self.expand_recurring_series(master, start_dt, end_dt))
+            except ValueError as e:
+                self.logger.debug('"' + str(master.subject) + '" is fetched from the server: ' + str(e))
+                unsupported_uids.add(master.uid[:FINDITEM_TEXT_LENGTH])
+        self.logger.debug(str(number_of_series) + ' recurring series found, ' +
+                          str(len(unsupported_uids)) + ' of them not expanded locally')
+
+        if unsupported_uids:
+            events = find_items(self.calendar_view(start_dt, end_dt).only(*(self.simple_calendar_fields() + ['uid'])))
+            for event in self.fetch_rich_fields(event for event in events
+                                                if (event.uid or '')[:FINDITEM_TEXT_LENGTH] in unsupported_uids):
+                entries.append((self.event_timestamp(event.start), self.convert_to_orgmode(event)))
+
+        if statistics:
+            # Counting the items without restriction costs two more requests:
+            statistics.count('server', self.account.calendar.filter(**single_query).count() - number_of_singles +
+                             self.account.calendar.filter(**master_query).count() - number_of_series)
+
+        entries.sort(key=lambda entry: entry[0])
+        return [entry for start, entry in entries if entry]
+
+    def event_timestamp(self, d):
+        """
+        Returns the POSIX timestamp of an EWSDate or EWSDateTime which
+        is used to sort and select stored events.
+
+        @param d: EWSDate or EWSDateTime
+        @param return: float
+        """
+        return self.ewsdate_to_ewsdatetime_with_tz(d).timestamp()
+
+    def sync_settings(self):
+        """
+        Returns a string describing all settings which influence the
+        Org-mode representation of stored events. A stored sync state
+        is only re-used when those settings did not change.
+        """
+        return repr([SYNC_STATE_VERSION, self.calendar_fields(), self.config.TIMEZONE,
+                     self.config.OMIT_SUBJECTS, self.config.OUTLOOK_HYPERLINK,
+                     self.config.WRITE_PROPERTIES_DRAWER, self.config.WRITE_SCHEDULED,
+                     self.config.WRITE_DEADLINE, self.entry_template(), options.ignore_category, options.verbose,
+                     options.include_categories, options.exclude_categories, options.include_organizers,
+                     options.exclude_organizers, options.include_freebusy, options.exclude_freebusy])
+
+    def store_event(self, items, event, start_dt, end_dt):
+        """
+        Renders an event and stores it in the dict of known items if it
+        overlaps the time range. Events outside of the time range are
+        removed from the dict.
+
+        @param items: dict of stored items, keyed by item ID
+        @param event: an Exchange calendar event
+        @param start_dt: EWSDateTime of the start of the time range
+        @param end_dt: EWSDateTime of the end of the time range
+        """
+
+        start = self.event_timestamp(event.start)
+        end = self.event_timestamp(event.end)
+
+        if end < start_dt.timestamp() or start >= end_dt.timestamp():
+            items.pop(event.id, None)
+            return
+
+        items[event.id] = {'changekey': event.changekey,
+                           'start': start,
+                           'end': end,
+                           'entry': self.convert_to_orgmode(event) or None}
+
+    def sync_calendar(self, statefilename, start_dt, end_dt):
+        """
+        Synchronizes the locally stored calendar events with the server
+        using the EWS SyncFolderItems operation and returns the
+        Org-mode entries of the time range.
+
+        Only created, updated and deleted items are fetched. The server
+        reports changes of a recurring series for its master only, so
+        the time range is fetched again when a series was modified.
+        Stored entries whose change key did not change are re-used
+        then, and only the occurrences of the modified series are
+        fetched in detail. When the time range moved since the last
+        run, only the newly covered days are fetched. The whole folder
+        is only scanned on the first run, when the settings changed or
+        when the server rejected the stored sync state.
+
+        @param statefilename: file name of the stored sync state
+        @param start_dt: EWSDateTime of the start of the time range
+        @param end_dt: EWSDateTime of the end of the time range
+        @param return: list of strings containing Org-mode entries
+        """
+
+        state = None
+        if os.path.isfile(statefilename):
+            try:
+                with open(statefilename, 'r') as statehandle:
+                    state = json.load(statehandle)
+            except ValueError:
+                self.logger.warning('Could not parse sync state file "' + statefilename + '". Doing a full refresh.')
+            else:
+                if state.get('settings') != self.sync_settings():
+                    self.logger.info('Settings changed since the last sync. Doing a full refresh.')
+                    state = None
+
+        if state is not None:
+            items = state['items']
+            masters = set(state['masters'])
+            refresh_range = False
+            fields = self.simple_calendar_fields() + ['type']
+            number_of_changes = 0
+            changed_events = []
+            try:
+                for change_type, item in self.account.calendar.sync_items(sync_state=state['sync_state'],
+                                                                          only_fields=fields):
+                    if change_type == 'read_flag_change':
+                        continue
+                    number_of_changes += 1
+                    if change_type == 'delete':
+                        if item.id in masters:
+                            masters.discard(item.id)
+                            refresh_range = True
+                        items.pop(item.id, None)
+                        changed_events = [event for event in changed_events if event.id != item.id]
+                    elif item.type == 'RecurringMaster' or item.id in masters:
+                        # Changes of a series or its exceptions are reported for the master only.
+                        # A new series starting after the time range has no occurrences in it:
+                        if change_type != 'create' or self.event_timestamp(item.start) < end_dt.timestamp():
+                            refresh_range = True
+                        if item.type == 'RecurringMaster':
+                            masters.add(item.id)
+                        else:
+                            # The series was turned into a single event:
+                            masters.discard(item.id)
+                    else:
+                        changed_events.append(item)
+            except exchangelib.errors.ErrorInvalidSyncStateData:
+                self.logger.warning('The server rejected the stored sync state. Doing a full refresh.')
+                state = None
+            else:
+                self.logger.debug('sync: ' + str(number_of_changes) + ' items were created, updated or deleted')
+                sync_state = self.account.calendar.item_sync_state
+
+        if state is None:
+            self.logger.debug('sync: scanning the calendar folder for recurring series')
+            # Get the current sync state and all recurring masters before
+            # fetching the events, so that nothing gets lost in between.
+            # Without a sync state, all items are reported as created:
+            self.account.calendar.item_sync_state = None
+            masters = set()
+            for change_type, item in self.account.calendar.sync_items(only_fields=['type']):
+                if change_type == 'create' and item.type == 'RecurringMaster':
+                    masters.add(item.id)
+            sync_state = self.account.calendar.item_sync_state
+            known_items = {}
+            items = {}
+            new_ranges = [(start_dt, end_dt)]
+        elif refresh_range:
+            self.logger.debug('sync: a recurring series was modified, fetching the time range again')
+            # Changed single events show up with a new change key as well:
+            known_items = items
+            items = {}
+            new_ranges = [(start_dt, end_dt)]
+        else:
+            for event in self.fetch_rich_fields(changed_events):
+                self.store_event(items, event, start_dt, end_dt)
+            # Fetch the days which were not covered by the last run:
+            items = {itemid: item for itemid, item in items.items()
+                     if item['end'] >= start_dt.timestamp() and item['start'] < end_dt.timestamp()}
+            new_ranges = []
+            old_start = exchangelib.EWSDateTime.fromtimestamp(state['start'], tz=self.tz)
+            old_end = exchangelib.EWSDateTime.fromtimestamp(state['end'], tz=self.tz)
+            if start_dt < old_start:
+                new_ranges.append((start_dt, min(old_start, end_dt)))
+            if end_dt > old_end:
+                new_ranges.append((max(old_end, start_dt), end_dt))
+
+            known_items = items
+
+        def unknown_events(events):
+            # Events which did not change since they were stored need no details:
+            for event in events:
+                known = known_items.get(event.id)
+                if known and known['changekey'] == event.changekey:
+                    items[event.id] = known
+                else:
+                    yield event
+
+        for range_start, range_end in new_ranges:
+            self.logger.debug('sync: fetching events from ' + range_start.ewsformat() + ' to ' + range_end.ewsformat())
+            for event in self.fetch_rich_fields(unknown_events(self.fetch_calendar_events(range_start, range_end))):
+                self.store_event(items, event, start_dt, end_dt)
+
+        if not options.dryrun:
+            write_json_atomically(statefilename, {'settings': self.sync_settings(),
+                                                  'sync_state': sync_state,
+                                                  'start': start_dt.timestamp(),
+                                                  'end': end_dt.timestamp(),
+                                                  'masters': sorted(masters),
+                                                  'items': items})
+
+        return [item['entry'] for item in sorted(items.values(), key=lambda item: item['start']) if item['entry']]
+
+    def count_calendar_changes(self, notification):
+        """
+        Returns the number of events of a notification which report
+        changes. Status events of a subscription are ignored.
+
+        @param notification: exchangelib Notification object
+        @param return: integer
+        """
+        return len([event for event in notification.events
+                    if not isinstance(event, exchangelib.properties.StatusEvent)])
+
+    def listen_for_calendar_changes(self, changes, mode):
+        """
+        Subscribes to notifications of the calendar folder and puts the
+        number of reported changes into the queue. Runs forever and is
+        meant to be run in a background thread.
+
+        When the subscription expired or the connection failed, a new
+        subscription is created. Since changes might have been missed
+        in between, this is reported as a change as well.
+
+        @param changes: queue.Queue receiving the number of changes
+        @param mode: 'pull' or 'streaming'
+        """
+
+        calendar = self.account.calendar
+
+        while True:
+            subscription_id = None
+            try:
+                if mode == 'streaming':
+                    subscription_id = calendar.subscribe_to_streaming()
+                    self.logger.debug('watch: created streaming subscription')
+                    while True:
+                        for notification in calendar.get_streaming_events(
+                                subscription_id, connection_timeout=WATCH_STREAMING_CONNECTION_TIMEOUT):
+                            number_of_changes = self.count_calendar_changes(notification)
+                            if number_of_changes:
+                                changes.put(number_of_changes)
+                else:
+                    subscription_id, watermark = calendar.subscribe_to_pull(timeout=WATCH_PULL_SUBSCRIPTION_TIMEOUT)
+                    self.logger.debug('watch: created pull subscription')
+                    while True:
+                        for notification in calendar.get_events(subscription_id, watermark):
+                            if notification.events:
+                                watermark = notification.events[-1].watermark
+                            number_of_changes = self.count_calendar_changes(notification)
+                            if number_of_changes:
+                                changes.put(number_of_changes)
+                        time.sleep(options.watch_interval)
+            except Exception as e:
+                self.logger.warning('watch: lost subscription of the calendar (' + repr(e) +
+                                    '); subscribing again in ' + str(options.watch_interval) + ' seconds')
+                if subscription_id:
+                    try:
+                        calendar.unsubscribe(subscription_id)
+                    except Exception:
+                        pass
+                time.sleep(options.watch_interval)
+                changes.put(1)
+
+    def watch_calendar(self, time_range, outputfilename):
+        """
+        Writes the output file and regenerates it whenever the server
+        reports changes of the calendar. Bursts of changes are
+        debounced: the output file is regenerated when no further
+        change was reported for --debounce seconds. The output file is
+        also regenerated when the day changes, since the time range
+        may be relative to the current day.
+
+        When the regeneration fails, for example because the server is
+        busy, the error is logged and the output file is regenerated on
+        the next change or after --watch-interval seconds, doubling the
+        delay after each further failure up to WATCH_MAX_RETRY_DELAY.
+
+        Runs until interrupted.
+
+        @param time_range: function returning the start day and the end day
+                           as lists of year, month, day as integers
+        @param outputfilename: name of the output file
+        """
+
+        changes = queue.Queue()
+        listener = threading.Thread(target=self.listen_for_calendar_changes, args=(changes, options.watch_mode),
+                                    name='exchange2org-watch', daemon=True)
+        listener.start()
+
+        failures = 0
+        while True:
+            today = datetime.date.today()
+            startday, endday = time_range()
+            try:
+                self.dump_calendar(startday=startday, endday=endday, outputfilename=outputfilename)
+                failures = 0
+            except Exception as e:
+                failures += 1
+                retry_delay = max(1, min(options.watch_interval * 2 ** (failures - 1), WATCH_MAX_RETRY_DELAY))
+                self.logger.error('watch: could not write "' + outputfilename + '" (' + repr(e) +
+                                  '); retrying on the next change or in ' + str(retry_delay) + ' seconds')
+
+            # Wait for the first change, the next day or the next retry:
+            midnight = datetime.datetime.combine(today + datetime.timedelta(days=1), datetime.time(0, 0))
+            timeout = max(1, (midnight - datetime.datetime.now()).total_seconds())
+            if failures:
+                timeout = min(timeout, retry_delay)
+            try:
+                number_of_changes = changes.get(timeout=timeout)
+            except queue.Empty:
+                self.logger.debug('watch: retrying' if failures else 'watch: day changed')
+                continue
+
+            # Wait until the burst of changes is over:
+            deadline = time.time() + options.debounce * WATCH_MAX_DEBOUNCE_FACTOR
+            while time.time() < deadline:
+                try:
+                    number_of_changes += changes.get(timeout=max(0, min(options.debounce, deadline - time.time())))
+                except queue.Empty:
+                    break
+            self.logger.info('watch: ' + str(number_of_changes) + ' changes reported by the server')
+
+    def shard_filename(self, range_start):
+        """
+        Returns the file name of the shard of --shard which starts with
+        the range, like 2026-03.org or 2026-W09.org.
+
+        @param range_start: EWSDateTime of the start of the range of the shard
+        """
+        if options.shard == 'week':
+            year, week, weekday = range_start.date().isocalendar()
+            return '%04d-W%02d.org' % (year, week)
+        return '%04d-%02d.org' % (range_start.year, range_start.month)
+
+    def write_shards(self, directory, start_dt, end_dt):
+        """
+        Writes the events of the time range into one file per week or
+        month in the directory. Each event is written into the shard of
+        its start, events starting before the time range into the first
+        shard. Only shards whose content changed are replaced. Shard
+        files outside of the time range are removed.
+
+        With --freeze-past, existing shards of past weeks or months are
+        neither fetched nor changed nor removed.
+
+        Finally, the index file lists the absolute file names of all
+        shards for org-agenda-files.
+
+        @param directory: name of the output directory
+        @param start_dt: EWSDateTime of the start of the time range
+        @param end_dt: EWSDateTime of the end of the time range
+        @param return: tuple of number of events written and boolean whether any file changed
+        """
+
+        today = datetime.date.today()
+        midnight = exchangelib.EWSDateTime(today.year, today.month, today.day).replace(tzinfo=self.tz)
+
+        if os.path.isdir(directory):
+            existing = set(filename for filename in os.listdir(directory) if SHARD_FILENAME_REGEX.match(filename))
+        elif options.dryrun:
+            existing = set()
+        else:
+            os.makedirs(directory)
+            existing = set()
+
+        number_of_events = 0
+        changed_shards = 0
+        removed_shards = 0
+        shards = []
+        for range_start, range_end in self.split_time_range(start_dt, end_dt, options.shard):
+            filename = self.shard_filename(range_start)
+            shards.append(filename)
+            if options.freeze_past and range_end <= midnight and filename in existing:
+                self.logger.debug('shard ' + filename + ' is frozen')
+                continue
+
+            # The view returns all events overlapping the range, but only
+            # those starting within it belong to this shard. The others
+            # are dropped before their details are fetched:
+            events = (event for event in self.fetch_calendar_events(range_start, range_end)
+                      if range_start.timestamp() <= max(self.event_timestamp(event.start), start_dt.timestamp())
+                      < range_end.timestamp())
+            entries = (self.convert_to_orgmode(event) for event in self.fetch_rich_fields(events))
+            entries = (entry for entry in entries if entry)
+            if statistics:
+                entries = statistics.timed_iterable('fetch', entries)
+
+            with statistics_phase('write'):
+                number_of_shard_events, changed = self.write_orgfile(os.path.join(directory, filename), entries)
+            number_of_events += number_of_shard_events
+            changed_shards += changed
+
+        if statistics:
+            statistics.count('emitted', number_of_events)
+
+        for filename in sorted(existing - set(shards)):
+            if options.freeze_past and filename < shards[0] and \
+               ('-W' in filename) == (options.shard == 'week'):
+                # frozen shards before the time range are kept:
+                shards.append(filename)
+            elif not options.dryrun:
+                self.logger.debug('removing shard ' + filename + ' outside of the time range')
+                os.remove(os.path.join(directory, filename))
+                removed_shards += 1
+        shards.sort()
+
+        if options.dryrun:
+            self.logger.info(str(number_of_events) + ' events would have been written to ' +
+                             str(len(shards)) + ' files in ' + directory)
+            return number_of_events, False
+
+        def write_index(indexhandle):
+            for filename in shards:
+                indexhandle.write(os.path.abspath(os.path.join(directory, filename)) + '\n')
+
+        write_file_if_changed(os.path.join(directory, SHARD_INDEX_FILENAME), write_index)
+
+        self.logger.info(str(number_of_events) + ' events found, ' + str(changed_shards) + ' of ' +
+                         str(len(shards)) + ' files in ' + directory + ' changed' +
+                         (', ' + str(removed_shards) + ' removed' if removed_shards else ''))
+
+        return number_of_events, changed_shards + removed_shards > 0
+
+    def render_cache_settings_hash(self):
+        """
+        Returns a hash of all settings which influence the Org-mode
+        representation of a single event. Cached entries are only
+        re-used when this hash did not change.
+        """
+        settings = repr([RENDER_CACHE_VERSION, self.config.OUTLOOK_HYPERLINK, self.config.WRITE_SCHEDULED,
+                         self.config.WRITE_DEADLINE, self.config.WRITE_PROPERTIES_DRAWER, self.config.TIMEZONE,
+                         options.verbose, self.entry_template(),
+                         # cached events are not checked by the filters of their details again:
+                         options.include_categories, self.excluded_categories(),
+                         options.include_organizers, options.exclude_organizers])
+        return hashlib.sha1(settings.encode('utf-8')).hexdigest()
+
+    def load_render_cache(self, cachefilename):
+        """
+        Loads the render cache from the file. An unreadable cache or a
+        cache of different settings results in an empty cache.
+
+        @param cachefilename: file name of the render cache
+        """
+
+        self.render_cache = {}
+        if not os.path.isfile(cachefilename):
+            return
+        try:
+            with open(cachefilename, 'r') as cachehandle:
+                cache = json.load(cachehandle)
+        except ValueError:
+            self.logger.warning('Could not parse render cache file "' + cachefilename + '". Ignoring it.')
+            return
+        if cache.get('settings') == self.render_cache_settings_hash():
+            self.render_cache = cache['entries']
+        else:
+            self.logger.debug('render cache: settings changed, ignoring the cached entries')
+
+    def save_render_cache(self, cachefilename, start_dt, end_dt):
+        """
+        Evicts all entries of events outside of the fetched time range
+        and the least recently used entries exceeding
+        RENDER_CACHE_MAX_ENTRIES. Writes the remaining entries to the file.
+
+        @param cachefilename: file name of the render cache
+        @param start_dt: EWSDateTime of the start of the fetched time range
+        @param end_dt: EWSDateTime of the end of the fetched time range
+        """
+
+        max_entries = getattr(self.config, 'RENDER_CACHE_MAX_ENTRIES', RENDER_CACHE_MAX_ENTRIES)
+        entries = [(itemid, entry) for itemid, entry in self.render_cache.items()
+                   if entry['end'] >= start_dt.timestamp() and entry['start'] < end_dt.timestamp()]
+        # The most recently used entries are at the end:
+        entries = entries[max(0, len(entries) - max_entries):]
+        self.logger.debug('render cache: keeping ' + str(len(entries)) + ' of ' +
+                          str(len(self.render_cache)) + ' entries')
+
+        write_json_atomically(cachefilename, {'settings': self.render_cache_settings_hash(),
+                                              'entries': dict(entries)})
+
+    def dump_calendar(self, startday, endday, outputfilename):
+        """
+        Retrieves Exchange calendar data from the server and writes output file.
+
+        @param startday: list of year, month, day as integers
+        @param endday: list of year, month, day as integers
+        @param outputfilename: name of the output file
+        @param return: number of events written
+        """
+
+        return self.run_with_session_cache(self.write_calendar, startday, endday, outputfilename)
+
+    def dump_tasks(self, startday, endday, outputfilename):
+        """
+        Retrieves Exchange tasks from the server and writes output file.
+
+        @param startday: list of year, month, day as integers
+        @param endday: list of year, month, day as integers
+        @param outputfilename: name of the output file
+        @param return: number of tasks written
+        """
+
+        return self.run_with_session_cache(self.write_tasks, startday, endday, outputfilename)
+
+    def dump_mail(self, folder, startday, endday, outputfilename):
+        """
+        Retrieves Exchange messages of a mail folder from the server and writes output file.
+
+        @param folder: path of the mail folder like 'Inbox/Projects'
+        @param startday: list of year, month, day as integers
+        @param endday: list of year, month, day as integers
+        @param outputfilename: name of the output file
+        @param return: number of messages written
+        """
+
+        return self.run_with_session_cache(self.write_mail, folder, startday, endday, outputfilename)
+
+    def run_with_session_cache(self, function, *args):
+        """
+        Calls a function which retrieves data from the server.
+
+        With --session-cache, a failed authentication or an unsupported
+        server version may be caused by outdated cached settings. Then
+        the cached settings are removed and the function is called
+        once more with probed settings. After a successful run, the
+        settings are cached.
+
+        @param function: method like self.write_calendar
+        @param args: arguments of the function
+        @param return: return value of the function
+        """
+
+        if not options.session_cache or not self.exchange_config:
+            return function(*args)
+
+        try:
+            result = function(*args)
+        except Exception as e:
+            if not is_session_cache_error(e) or not getattr(self.exchange_config, 'from_session_cache', False):
+                raise
+            remove_session_cache(self.config)
+            self.logger.warning('Cached session settings failed (' + repr(e) + '), retrying without them')
+            self.connect(use_session_cache=False)
+            result = function(*args)
+
+        if not options.dryrun:
+            save_session_cache(self.config, self.account.protocol, getattr(self.exchange_config, 'session_cache', None))
+
+        return result
+
+    def write_calendar(self, startday, endday, outputfilename):
+        """
+        Retrieves Exchange calendar data from the server and writes output file.
+
+        @param startday: list of year, month, day as integers
+        @param endday: list of year, month, day as integers
+        @param outputfilename: name of the output file
+        @param return: number of events written
+        """
+
+        start_dt = exchangelib.EWSDateTime(*startday).replace(tzinfo=self.tz)
+        end_dt = exchangelib.EWSDateTime(*endday).replace(tzinfo=self.tz)
+
+        if options.backfill:
+            return self.write_backfill(outputfilename, start_dt, end_dt)
+
+        if options.shard:
+            # the render cache is stored next to the directory:
+            outputfilename = outputfilename.rstrip(os.sep)
+
+        if options.render_cache:
+            with statistics_phase('cache'):
+                self.load_render_cache(outputfilename + RENDER_CACHE_SUFFIX)
+
+        if options.shard:
+            number_of_events, changed = self.write_shards(outputfilename, start_dt, end_dt)
+
+            if options.render_cache and not options.dryrun:
+                with statistics_phase('cache'):
+                    self.save_render_cache(outputfilename + RENDER_CACHE_SUFFIX, start_dt, end_dt)
+
+            return number_of_events
+
+        if options.repeaters:
+            entries = self.fetch_calendar_entries_with_repeaters(start_dt, end_dt)
+        elif options.incremental:
+            entries = self.sync_calendar(outputfilename + SYNC_STATE_SUFFIX, start_dt, end_dt)
+        else:
+            # Fetch all calendar events from the Exchange server:
+            entries = self.fetch_calendar_entries(start_dt, end_dt)
+
+        if statistics:
+            # entries are fetched while the output file is written:
+            entries = statistics.timed_iterable('fetch', entries)
+
+        with statistics_phase('write'):
+            number_of_events, changed = self.write_orgfile(outputfilename, entries)
+
+        if statistics:
+            statistics.count('emitted', number_of_events)
+
+        if options.render_cache and not options.dryrun:
+            with statistics_phase('cache'):
+                self.save_render_cache(outputfilename + RENDER_CACHE_SUFFIX, start_dt, end_dt)
+
+        if options.dryrun:
+            self.logger.info(str(number_of_events) + ' events would have been written to ' + outputfilename)
+        elif changed:
+            self.logger.info(str(number_of_events) + ' events were written to ' + outputfilename)
+        else:
+            self.logger.info(str(number_of_events) + ' events found, ' + outputfilename + ' is unchanged')
+
+        return number_of_events
+
+    def backfill_settings(self, start_dt, end_dt):
+        """
+        Returns the settings of --backfill which have to match in order
+        to resume an interrupted run: the time range, the chunks and
+        the settings of the Org-mode entries.
+        """
+        return [BACKFILL_CHECKPOINT_VERSION, start_dt.ewsformat(), end_dt.ewsformat(), options.backfill_chunk,
+                self.sync_settings()]
+
+    def load_backfill_checkpoint(self, checkpointfilename, outputfilename, settings):
+        """
+        Returns the checkpoint of an interrupted --backfill run or None
+        if there is none or it can not be resumed.
+
+        @param checkpointfilename: name of the checkpoint file
+        @param outputfilename: name of the output file
+        @param settings: the settings of backfill_settings()
+        @param return: dict with the start of the next chunk, the size of the
+                       output file and the number of events written
+        """
+
+        if not os.path.isfile(checkpointfilename):
+            return None
+
+        try:
+            with open(checkpointfilename, 'r') as checkpointhandle:
+                checkpoint = json.load(checkpointhandle)
+        except ValueError:
+            self.logger.warning('Could not parse backfill checkpoint "' + checkpointfilename + '". Starting over.')
+            return None
+
+        if checkpoint.get('settings') != settings:
+            self.logger.info('Time range or settings changed since the interrupted backfill. Starting over.')
+            return None
+        if not os.path.isfile(outputfilename) or os.path.getsize(outputfilename) < checkpoint['size']:
+            self.logger.warning('Output file "' + outputfilename + '" is shorter than recorded. Starting over.')
+            return None
+
+        return checkpoint
+
+    def fetch_backfill_chunk(self, chunk_start, chunk_end, first):
+        """
+        Returns the Org-mode entries of a chunk of --backfill.
+
+        A chunk contains the events which start in it. Events which
+        started earlier were written with the chunk they started in,
+        except for events which started before the first chunk. A chunk
+        is fetched again after temporary errors, waiting longer after
+        each of the BACKFILL_RETRIES retries.
+
+        @param chunk_start: EWSDateTime of the start of the chunk
+        @param chunk_end: EWSDateTime of the end of the chunk
+        @param first: boolean whether this is the first chunk of the time range
+        @param return: list of strings containing Org-mode entries
+        """
+
+        delay = BACKFILL_RETRY_DELAY
+        for retry in range(BACKFILL_RETRIES + 1):
+            try:
+                events = self.fetch_calendar_events(chunk_start, chunk_end)
+                if statistics:
+                    events = statistics.timed_iterable('fetch', events)
+                events = (event for event in events
+                          if first or self.event_timestamp(event.start) >= chunk_start.timestamp())
+                return [entry for entry in map(self.convert_to_orgmode, self.fetch_rich_fields(events)) if entry]
+            except Exception as e:
+                if retry == BACKFILL_RETRIES or not is_transient_error(e):
+                    raise
+                self.logger.warning('Fetching events from ' + chunk_start.ewsformat() + ' to ' +
+                                    chunk_end.ewsformat() + ' failed (' + repr(e) + '), retrying in ' +
+                                    str(delay) + ' seconds')
+                time.sleep(delay)
+                delay *= 2
+
+    def write_backfill(self, outputfilename, start_dt, end_dt):
+        """
+        Writes the calendar events of a long time range to the output
+        file in chunks of a week or a month of --backfill-chunk.
+
+        Unlike write_orgfile(), the output file is written directly:
+        the entries of each chunk are appended as soon as they are
+        fetched, so only one chunk is held in memory. After each chunk,
+        the size of the output file and the start of the next chunk are
+        recorded in a checkpoint file. A run which was interrupted or
+        failed resumes with the chunk after the last recorded one and
+        truncates the output file to the recorded size first, which
+        removes a partially appended chunk. The checkpoint file is
+        removed when the output file is complete.
+
+        @param outputfilename: name of the output file
+        @param start_dt: EWSDateTime of the start of the time range
+        @param end_dt: EWSDateTime of the end of the time range
+        @param return: number of events written
+        """
+
+        checkpointfilename = outputfilename + BACKFILL_CHECKPOINT_SUFFIX
+        settings = self.backfill_settings(start_dt, end_dt)
+        chunks = self.split_time_range(start_dt, end_dt, options.backfill_chunk)
+
+        if options.dryrun:
+            number_of_events = sum(len(self.fetch_backfill_chunk(chunk_start, chunk_end, chunk_start == start_dt))
+                                   for chunk_start, chunk_end in chunks)
+            self.logger.info(str(number_of_events) + ' events would have been written to ' + outputfilename)
+            return number_of_events
+
+        checkpoint = self.load_backfill_checkpoint(checkpointfilename, outputfilename, settings)
+        if checkpoint:
+            self.logger.info('Resuming backfill of ' + outputfilename + ' at ' +
+                             datetime.datetime.fromtimestamp(checkpoint['next'], self.tz).strftime('%Y-%m-%d'))
+            os.truncate(outputfilename, checkpoint['size'])
+        else:
+            with open(outputfilename, 'wb') as outputhandle:
+                outputhandle.write(self.orgfile_header().encode('utf-8'))
+            checkpoint = {'settings': settings, 'next': start_dt.timestamp(),
+                          'size': os.path.getsize(outputfilename), 'events': 0}
+            write_json_atomically(checkpointfilename, checkpoint)
+
+        # binary mode, so that tell() returns the size for the checkpoint:
+        with open(outputfilename, 'ab') as outputhandle:
+            for chunk_start, chunk_end in chunks:
+                if chunk_start.timestamp() < checkpoint['next']:
+                    continue
+                entries = self.fetch_backfill_chunk(chunk_start, chunk_end, chunk_start == start_dt)
+                self.logger.debug('backfill: ' + str(len(entries)) + ' events from ' + chunk_start.ewsformat() +
+                                  ' to ' + chunk_end.ewsformat())
+                with statistics_phase('write'):
+                    outputhandle.write(''.join(entries).encode('utf-8'))
+                    outputhandle.flush()
+                    os.fsync(outputhandle.fileno())
+                if statistics:
+                    statistics.count('emitted', len(entries))
+                checkpoint.update(next=chunk_end.timestamp(), size=outputhandle.tell(),
+                                  events=checkpoint['events'] + len(entries))
+                write_json_atomically(checkpointfilename, checkpoint)
+
+            outputhandle.write(ORGFILE_FOOTER.encode('utf-8'))
+
+        os.remove(checkpointfilename)
+        self.logger.info(str(checkpoint['events']) + ' events were written to ' + outputfilename)
+        return checkpoint['events']
+
+    def export_items(self, query, omitted_reason, convert, outputfilename, title):
+        """
+        Writes the Org-mode entries of Exchange items like tasks or
+        messages to the output file through a pipeline of generators:
+        the items are fetched page by page, filtered, converted and
+        written one after the other. Only the pages of --prefetch are
+        held in memory, so the memory usage does not depend on the
+        number of items in the folder.
+
+        Filters which EWS supports belong into the restriction of the
+        query. The items are fetched by find_items(), so the query must
+        only request fields which FindItem returns and no GetItem
+        request is needed for each item.
+
+        @param query: exchangelib query of the items with restriction, fields and order
+        @param omitted_reason: function which returns why an item is omitted or None
+        @param convert: function which returns the Org-mode entry of an item
+        @param outputfilename: name of the output file
+        @param title: title of the header like 'Tasks', see orgfile_header()
+        @param return: number of entries written
+        """
+
+        if options.page_size:
+            query.page_size = options.page_size
+        items = find_items(query)
+        if options.prefetch > 0:
+            items = self.prefetch_pages(items, options.prefetch)
+
+        def filtered(items):
+            for item in items:
+                if statistics:
+                    statistics.count('seen')
+                omitted = omitted_reason(item)
+                if omitted:
+                    if statistics:
+                        statistics.count(omitted)
+                    continue
+                yield item
+
+        if statistics:
+            items = statistics.timed_iterable('fetch', items)
+            convert = statistics.timed_function('convert', convert)
+
+        with statistics_phase('write'):
+            number_of_entries, changed = self.write_orgfile(outputfilename, map(convert, filtered(items)), title)
+
+        if statistics:
+            statistics.count('emitted', number_of_entries)
+
+        if options.dryrun:
+            self.logger.info(str(number_of_entries) + ' entries would have been written to ' + outputfilename)
+        elif changed:
+            self.logger.info(str(number_of_entries) + ' entries were written to ' + outputfilename)
+        else:
+            self.logger.info(str(number_of_entries) + ' entries found, ' + outputfilename + ' is unchanged')
+
+        return number_of_entries
+
+    def item_entry(self, heading, item, planning):
+        """
+        Returns the Org-mode entry of a task or a message with the
+        link of OUTLOOK_HYPERLINK and the PROPERTIES drawer of
+        WRITE_PROPERTIES_DRAWER like the default output of events.
+
+        @param heading: heading without stars and link
+        @param item: the Exchange item
+        @param planning: list of strings like 'DEADLINE: <2026-10-18 Sun>'
+        @param return: string containing the Org-mode entry
+        """
+
+        entry_id = self.convert_itemid_from_exchange_to_entryid_for_outlook(str(item.id))
+        entry = '** ' + heading
+        if len(self.config.OUTLOOK_HYPERLINK) > 1:
+            entry += ' [[outlook:' + entry_id + '][⦿]]'
+        entry += '\n'
+        if planning:
+            entry += ' '.join(planning) + '\n'
+        if self.config.WRITE_PROPERTIES_DRAWER:
+            entry += ':PROPERTIES:\n:ID: ' + entry_id + '\n:END:\n'
+        return entry
+
+    def convert_task_to_orgmode(self, task):
+        """
+        Gets a task and returns its representation as Org-mode TODO entry.
+
+        @param task: an Exchange task with the fields of write_tasks()
+        @param return: string containing a heading with a representation of the task
+        """
+
+        planning = []
+        if task.is_complete and task.complete_date:
+            planning.append('CLOSED: [' + task.complete_date.astimezone(self.tz).strftime('%Y-%m-%d %a %H:%M') + ']')
+        if task.due_date:
+            planning.append('DEADLINE: <' + task.due_date.strftime('%Y-%m-%d %a') + '>')
+        if task.start_date and not task.is_complete:
+            planning.append('SCHEDULED: <' + task.start_date.strftime('%Y-%m-%d %a') + '>')
+
+        heading = ('DONE ' if task.is_complete else 'TODO ') + IMPORTANCE_PRIORITIES.get(task.importance, '') + \
+            (task.subject or '')
+        return self.item_entry(heading, task, planning)
+
+    def write_tasks(self, startday, endday, outputfilename):
+        """
+        Retrieves the open tasks and the tasks completed since the start
+        day from the server and writes them to the output file.
+
+        @param startday: list of year, month, day as integers
+        @param endday: list of year, month, day as integers, not used
+        @param outputfilename: name of the output file
+        @param return: number of tasks written
+        """
+
+        start_dt = exchangelib.EWSDateTime(*startday).replace(tzinfo=self.tz)
+        restriction = (exchangelib.Q(is_complete=False) | exchangelib.Q(complete_date__gte=start_dt)) & \
+            self.category_restriction()
+        query = self.account.tasks.filter(restriction).only(
+            'subject', 'importance', 'is_complete', 'complete_date', 'due_date', 'start_date').order_by(
+            'due_date', 'subject')
+
+        return self.export_items(query, lambda task: None, self.convert_task_to_orgmode, outputfilename, 'Tasks')
+
+    def mail_folder(self, path):
+        """
+        Returns the mail folder of a path like 'Inbox/Projects' below
+        the root of the mailbox.
+
+        @param path: folder names separated by slashes
+        @param return: exchangelib folder
+        """
+
+        folder = self.account.msg_folder_root
+        for name in path.strip('/').split('/'):
+            try:
+                folder = folder // name
+            except exchangelib.errors.ErrorFolderNotFound:
+                error_exit(5, 'Mail folder "' + path + '" not found: "' + name + '" is not a subfolder of "' +
+                           folder.name + '".')
+        return folder
+
+    def omitted_message_reason(self, message):
+        """
+        Returns why a message is omitted in the output or None. The
+        sender can not be restricted on the server, so --include-organizer
+        and --exclude-organizer are applied here.
+
+        @param message: an Exchange message with the fields of write_mail()
+        @param return: 'organizer' or None
+        """
+
+        if (options.include_organizers or options.exclude_organizers) and \
+           self.organizer_omitted(getattr(message, 'sender_name', None), getattr(message, 'sender_email_address', None)):
+            return 'organizer'
+        return None
+
+    def convert_message_to_orgmode(self, message):
+        """
+        Gets a message and returns its representation in Org-mode
+        format. Flagged messages become TODO entries with the due date
+        of their flag as deadline, messages with completed flags
+        become DONE entries.
+
+        @param message: an Exchange message with the fields of write_mail()
+        @param return: string containing a heading with a representation of the message
+        """
+
+        # Folders other than the standard mail folders may contain items
+        # without the properties of register_message_properties():
+        flag_status = getattr(message, 'flag_status', None)
+        flag_due_date = getattr(message, 'flag_due_date', None)
+        sender_name = getattr(message, 'sender_name', None)
+
+        keyword = {FLAG_STATUS_FLAGGED: 'TODO ', FLAG_STATUS_COMPLETE: 'DONE '}.get(flag_status, '')
+        planning = []
+        if flag_status == FLAG_STATUS_FLAGGED and flag_due_date:
+            planning.append('DEADLINE: <' + flag_due_date.astimezone(self.tz).strftime('%Y-%m-%d %a') + '>')
+
+        heading = keyword + IMPORTANCE_PRIORITIES.get(message.importance, '') + \
+            '[' + message.datetime_received.astimezone(self.tz).strftime('%Y-%m-%d %a %H:%M') + '] ' + \
+            (message.subject or '') + (' (' + sender_name + ')' if sender_name else '')
+        return self.item_entry(heading, message, planning)
+
+    def write_mail(self, path, startday, endday, outputfilename):
+        """
+        Retrieves the messages of a mail folder which were received in
+        the time range from the server and writes them to the output
+        file. With --flagged, all flagged messages are retrieved
+        regardless of the time range.
+
+        @param path: path of the mail folder like 'Inbox/Projects'
+        @param startday: list of year, month, day as integers
+        @param endday: list of year, month, day as integers
+        @param outputfilename: name of the output file
+        @param return: number of messages written
+        """
+
+        register_message_properties()
+        folder = self.mail_folder(path)
+
+        if options.flagged:
+            restriction = exchangelib.Q(flag_status=FLAG_STATUS_FLAGGED)
+        else:
+            start_dt = exchangelib.EWSDateTime(*startday).replace(tzinfo=self.tz)
+            end_dt = exchangelib.EWSDateTime(*endday).replace(tzinfo=self.tz)
+            restriction = exchangelib.Q(datetime_received__gte=start_dt, datetime_received__lt=end_dt)
+        restriction &= self.category_restriction()
+        query = folder.filter(restriction).only(
+            'subject', 'importance', 'datetime_received', 'sender_name', 'sender_email_address',
+            'flag_status', 'flag_due_date').order_by('datetime_received')
+
+        return self.export_items(query, self.omitted_message_reason, self.convert_message_to_orgmode,
+                                 outputfilename, 'Messages of "' + path + '"')
+
+    def fetch_freebusy(self, addresses, start_dt, end_dt):
+        """
+        Fetches the free/busy times of people from the server.
+
+        One GetUserAvailability request returns the free/busy times of
+        up to 100 people, so exchangelib batches the addresses. The
+        time range is split into windows of FREEBUSY_MAX_DAYS days,
+        which results in one request per window for teams of up to
+        100 people instead of one calendar dump per person.
+
+        @param addresses: list of e-mail addresses
+        @param start_dt: EWSDateTime of the start of the time range
+        @param end_dt: EWSDateTime of the end of the time range
+        @param return: dict of address and list of exchangelib CalendarEvent
+                       or the exception of the server for this address
+        """
+
+        events = {address: [] for address in addresses}
+        window_start = start_dt
+        while window_start < end_dt:
+            window_end = min(window_start + datetime.timedelta(days=FREEBUSY_MAX_DAYS), end_dt)
+            self.logger.debug('fetching free/busy times of ' + str(len(addresses)) + ' people from ' +
+                              window_start.ewsformat() + ' to ' + window_end.ewsformat())
+            views = self.account.protocol.get_free_busy_info(
+                accounts=[(address, 'Required', False) for address in addresses],
+                start=window_start, end=window_end, requested_view='FreeBusy')
+            # The views are returned in the order of the addresses:
+            for address, view in zip(addresses, views):
+                if isinstance(events[address], Exception):
+                    continue
+                if isinstance(view, Exception):
+                    events[address] = view
+                else:
+                    events[address].extend(view.calendar_events or [])
+            window_start = window_end
+
+        return events
+
+    def merge_freebusy_blocks(self, events):
+        """
+        Merges overlapping and adjacent free/busy events of the same
+        status into blocks. Events of windows of fetch_freebusy() which
+        overlap the boundary of two windows are returned twice and get
+        merged as well. Only the statuses of --include-freebusy or,
+        by default, FREEBUSY_WRITTEN_STATUSES except --exclude-freebusy
+        are kept.
+
+        @param events: list of exchangelib CalendarEvent
+        @param return: list of [start, end, status] in chronological order
+        """
+
+        statuses = options.include_freebusy or [status for status in FREEBUSY_WRITTEN_STATUSES
+                                                if status not in (options.exclude_freebusy or [])]
+        blocks = []
+        # index of the last block of each status:
+        last_blocks = {}
+        for event in sorted(events, key=lambda event: event.start):
+            if event.busy_type not in statuses:
+                continue
+            index = last_blocks.get(event.busy_type)
+            if index is not None and event.start <= blocks[index][1]:
+                blocks[index][1] = max(blocks[index][1], event.end)
+            else:
+                last_blocks[event.busy_type] = len(blocks)
+                blocks.append([event.start, event.end, event.busy_type])
+        return blocks
+
+    def convert_freebusy_to_orgmode(self, address, events):
+        """
+        Gets the free/busy times of a person and returns them as an
+        Org-mode subtree with one entry per block.
+
+        @param address: e-mail address of the person
+        @param events: list of exchangelib CalendarEvent or the exception of the server
+        @param return: string containing the subtree
+        """
+
+        if isinstance(events, Exception):
+            self.logger.warning('No free/busy times of ' + address + ': ' + str(events))
+            return '** ' + address + '\n: No free/busy times: ' + str(events) + '\n'
+
+        blocks = self.merge_freebusy_blocks(events)
+        if statistics:
+            statistics.count('seen', len(events))
+            statistics.count('emitted', len(blocks))
+
+        output = '** ' + address + '\n'
+        for start, end, status in blocks:
+            start = self.ewsdate_to_ewsdatetime_with_tz(start)
+            end = self.ewsdate_to_ewsdatetime_with_tz(end)
+            if start.time() == end.time() == datetime.time(0, 0):
+                # whole days like out of office:
+                last_day = end.date() - datetime.timedelta(days=1)
+                timestamp = '<' + start.strftime('%Y-%m-%d %a') + '>'
+                if last_day > start.date():
+                    timestamp += '--<' + last_day.strftime('%Y-%m-%d %a') + '>'
+            else:
+                timestamp = self.generate_orgmode_date_range(start, end)
+            output += '*** ' + timestamp + ' ' + status + '\n'
+        return output
+
+    def write_freebusy(self, addresses, startday, endday, outputfilename):
+        """
+        Retrieves the free/busy times of people from the server and
+        writes them to the output file.
+
+        @param addresses: list of e-mail addresses
+        @param startday: list of year, month, day as integers
+        @param endday: list of year, month, day as integers
+        @param outputfilename: name of the output file
+        @param return: number of people written
+        """
+
+        start_dt = exchangelib.EWSDateTime(*startday).replace(tzinfo=self.tz)
+        end_dt = exchangelib.EWSDateTime(*endday).replace(tzinfo=self.tz)
+
+        with statistics_phase('fetch'):
+            events = self.fetch_freebusy(addresses, start_dt, end_dt)
+
+        with statistics_phase('convert'):
+            entries = [self.convert_freebusy_to_orgmode(address, events[address]) for address in addresses]
+
+        with statistics_phase('write'):
+            number_of_people, changed = self.write_orgfile(outputfilename, entries, 'Free/busy times')
+
+        if options.dryrun:
+            self.logger.info('free/busy times of ' + str(number_of_people) + ' people would have been written to ' +
+                             outputfilename)
+        elif changed:
+            self.logger.info('free/busy times of ' + str(number_of_people) + ' people were written to ' + outputfilename)
+        else:
+            self.logger.info('free/busy times of ' + str(number_of_people) + ' people found, ' + outputfilename +
+                             ' is unchanged')
+
+        return number_of_people
+
+    def dump_freebusy(self, addresses, startday, endday, outputfilename):
+        """
+        Retrieves the free/busy times of people from the server and writes output file.
+
+        @param addresses: list of e-mail addresses
+        @param startday: list of year, month, day as integers
+        @param endday: list of year, month, day as integers
+        @param outputfilename: name of the output file
+        @param return: number of people written
+        """
+
+        return self.run_with_session_cache(self.write_freebusy, addresses, startday, endday, outputfilename)
+
+
+def find_items(query):
+    """
+    Returns a generator of the items of an exchangelib query which
+    only uses FindItem requests.
+
+    exchangelib fetches the fields it regards as complex, like all text
+    fields and extended properties, by an additional GetItem request
+    for every item. Many of them are returned by FindItem as well,
+    text fields truncated to FINDITEM_TEXT_LENGTH characters. Queries
+    which only request such fields get them from the result pages of
+    FindItem instead.
+
+    @param query: exchangelib query of items with the fields of only()
+    @param return: generator of exchangelib items
+    """
+
+    # FolderCollection.find_items() refuses complex fields, so the FindItem service is called directly:
+    folders = query.folder_collection
+    restriction = None if query.q.is_empty() else \
+        exchangelib.restriction.Restriction(query.q, folders=folders.folders,
+                                            applies_to=exchangelib.restriction.Restriction.ITEMS)
+    yield from exchangelib.services.FindItem(account=folders.account, page_size=query.page_size).call(
+        folders=folders.folders,
+        # includes the time zones of the start and the end of calendar items:
+        additional_fields=query._additional_fields(),
+        restriction=restriction, order_fields=None if query.calendar_view else query.order_fields,
+        shape=exchangelib.items.ID_ONLY, query_string=None, depth=exchangelib.items.SHALLOW,
+        calendar_view=query.calendar_view, max_items=query.max_items, offset=0)
+
+
+def register_message_properties():
+    """
+    Registers extended MAPI properties of messages as fields of
+    exchangelib.Message and of the meeting requests, responses and
+    cancellations which mail folders like the Inbox contain as well:
+    the name and the SMTP address of the sender, the flag status and
+    the due date of the flag. FindItem returns them, unlike the sender
+    and the flag fields of exchangelib. exchangelib still regards all
+    extended properties as complex fields and would fetch them by a
+    GetItem request per message, so write_mail() fetches its messages
+    by find_items().
+    """
+
+    models = exchangelib.items.MESSAGE_ITEM_CLASSES
+    if all('flag_status' in model.FIELDS for model in models):
+        return
+
+    class SenderName(exchangelib.ExtendedProperty):
+        property_tag = 0x0C1A  # PidTagSenderName
+        property_type = 'String'
+
+    class SenderEmailAddress(exchangelib.ExtendedProperty):
+        property_tag = 0x5D01  # PidTagSenderSmtpAddress
+        property_type = 'String'
+
+    class FlagStatus(exchangelib.ExtendedProperty):
+        property_tag = 0x1090  # PidTagFlagStatus
+        property_type = 'Integer'
+
+    class FlagDueDate(exchangelib.ExtendedProperty):
+        distinguished_property_set_id = 'Task'
+        property_id = 0x8105  # PidLidTaskDueDate
+        property_type = 'SystemTime'
+
+    for model in models:
+        if 'flag_status' not in model.FIELDS:
+            model.register('sender_name', SenderName)
+            model.register('sender_email_address', SenderEmailAddress)
+            model.register('flag_status', FlagStatus)
+            model.register('flag_due_date', FlagDueDate)
+
+
+def mailbox_name(mailbox):
+    """
+    Returns the name of an exchangelib Mailbox or its e-mail address if
+    it has no name.
+    """
+    if not mailbox:
+        return None
+    return mailbox.name or mailbox.email_address
+
+
+class OrgTextParser(html.parser.HTMLParser):
+    """
+    Collects the text of an HTML body. Block elements result in line
+    breaks, list items in Org-mode list items and links in Org-mode
+    links. Styles, scripts and the head are skipped.
+    """
+
+    BLOCK_TAGS = set(['p', 'div', 'br', 'tr', 'table', 'ul', 'ol', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'blockquote'])
+    SKIPPED_TAGS = set(['style', 'script', 'head', 'title'])
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skipped = 0
+        self.link = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED_TAGS:
+            self.skipped += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append('\n')
+        elif tag == 'li':
+            self.parts.append('\n- ')
+        elif tag == 'td':
+            self.parts.append(' ')
+        elif tag == 'a':
+            href = dict(attrs).get('href')
+            if href and not href.startswith('mailto:'):
+                self.link = (href, len(self.parts))
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED_TAGS:
+            self.skipped = max(0, self.skipped - 1)
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append('\n')
+        elif tag == 'a' and self.link:
+            href, position = self.link
+            text = ' '.join(''.join(self.parts[position:]).split())
+            del self.parts[position:]
+            self.parts.append('[[' + href + '][' + text + ']]' if text and text != href else '[[' + href + ']]')
+            self.link = None
+
+    def handle_data(self, data):
+        if not self.skipped:
+            # whitespace of HTML is not significant:
+            self.parts.append(re.sub(r'\s+', ' ', data))
+
+    def text(self):
+        return ''.join(self.parts)
+
+
+def body_to_org(body):
+    """
+    Returns the body of an item as compact Org-mode text: HTML is
+    converted to text, whitespace is collapsed and empty lines are
+    removed. Lines which Org-mode would read as headings, drawers or
+    keywords are indented.
+
+    @param body: exchangelib Body, HTMLBody or None
+    @param return: string or None for empty bodies
+    """
+
+    if not body:
+        return None
+    if isinstance(body, exchangelib.HTMLBody):
+        parser = OrgTextParser()
+        parser.feed(body)
+        parser.close()
+        text = parser.text()
+    else:
+        text = str(body)
+
+    lines = []
+    for line in text.splitlines():
+        line = ' '.join(line.replace('\xa0', ' ').split())
+        if not line:
+            continue
+        if re.match(r'(\*+ |#\+|:\w+:$)', line):
+            line = ' ' + line
+        lines.append(line)
+
+    return '\n'.join(lines) or None
+
+
+def files_differ(filename1, filename2):
+    """
+    Compares two output files line by line. The time-stamp of the
+    generation in the heading of the header is ignored, but not
+    similar text in the entries.
+
+    @param return: True if the files differ
+    """
+
+    with open(filename1, 'r', encoding='utf-8') as handle1, open(filename2, 'r', encoding='utf-8') as handle2:
+        for number, (line1, line2) in enumerate(itertools.zip_longest(handle1, handle2)):
+            if line1 is None or line2 is None:
+                return True
+            if line1 != line2 and \
+               (number != ORGFILE_HEADING_LINE or
+                GENERATED_AT_REGEX.sub('', line1, count=1) != GENERATED_AT_REGEX.sub('', line2, count=1)):
+                return True
+
+    return False
+
+
+def write_file_if_changed(filename, write):
+    """
+    Writes a file atomically, but only if its content changed.
+
+    The content is written by write(filehandle) to a temporary file in
+    the same directory. If the content does not differ from the
+    existing file (ignoring the time-stamp of the header), the existing
+    file is left untouched. Otherwise the temporary file is renamed
+    over it, so that readers never see a partially written file. If
+    write() raises an exception, the existing file is left untouched.
+
+    @param filename: name of the file
+    @param write: function writing the content to the file handle it gets
+    @param return: True if the file was written
+    """
+
+    directory = os.path.dirname(os.path.abspath(filename))
+    temphandle = tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=directory,
+                                             prefix='.' + os.path.basename(filename) + '.', delete=False)
+    try:
+        with temphandle:
+            write(temphandle)
+
+        if os.path.isfile(filename) and not files_differ(filename, temphandle.name):
+            os.remove(temphandle.name)
+            return False
+
+        # NamedTemporaryFile() creates files with mode 0600:
+        if os.path.isfile(filename):
+            os.chmod(temphandle.name, stat.S_IMODE(os.stat(filename).st_mode))
+        else:
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(temphandle.name, 0o666 & ~umask)
+        os.replace(temphandle.name, filename)
+    except BaseException:
+        if os.path.exists(temphandle.name):
+            os.remove(temphandle.name)
+        raise
+
+    return True
+
+
+def write_json_atomically(filename, data):
+    """
+    Replaces a JSON file atomically, so that an interruption never
+    leaves a partially written file behind, which would be discarded
+    when it is read the next time.
+
+    @param filename: name of the file
+    @param data: object to write as JSON
+    """
+
+    handle, tempfilename = tempfile.mkstemp(prefix='.' + os.path.basename(filename) + '.',
+                                            dir=os.path.dirname(os.path.abspath(filename)))
+    try:
+        with os.fdopen(handle, 'w') as filehandle:
+            json.dump(data, filehandle)
+        os.replace(tempfilename, filename)
+    except BaseException:
+        if os.path.exists(tempfilename):
+            os.remove(tempfilename)
+        raise
+
+
+def max_connections_per_account():
+    """
+    Returns the number of HTTP connections one account may use concurrently.
+    """
+    max_connections = 1
+    if options.fetch_window:
+        max_connections = max(1, options.fetch_workers)
+    elif options.prefetch > 0:
+        # The thread of prefetch_pages() fetches while the details are fetched:
+        max_connections += 1
+    if not (options.tasks or options.mail or options.freebusy):
+        # The location is fetched by the threads of fetch_rich_fields() for
+        # every calendar, so there are always details to fetch:
+        max_connections += max(1, options.rich_workers)
+    if options.watch:
+        # The subscription of --watch keeps a connection of its own:
+        max_connections += 1
+    return max_connections
+
+
+def exchange_configuration(config, max_connections=None, use_session_cache=True):
+    """
+    Returns the exchangelib.Configuration for the server and the credentials
+    of a configuration.
+
+    All accounts using the same exchangelib.Configuration share one
+    protocol instance and therefore its pool of HTTP sessions.
+
+    With --session-cache, the cached EWS URL, authentication type and
+    server version are used so that exchangelib does not probe them.
+
+    @param config: the configuration module or an object with the same attributes
+    @param max_connections: size of the pool of HTTP sessions
+    @param use_session_cache: boolean whether the settings of --session-cache may be used
+    """
+    import_exchangelib()
+    credentials = exchangelib.Credentials(config.USERNAME, config.PASSWORD)
+
+    cached = options.session_cache and use_session_cache and load_session_cache(config)
+    if cached:
+        logging.debug('using cached session settings: ' + cached['service_endpoint'] + ', ' +
+                      cached['auth_type'] + ', ' + cached['api_version'])
+        build = exchangelib.Build(*cached['build']) if cached['build'] else None
+        configuration = exchangelib.Configuration(credentials, service_endpoint=cached['service_endpoint'],
+                                                  auth_type=cached['auth_type'],
+                                                  version=exchangelib.Version(build, api_version=cached['api_version']),
+                                                  max_connections=max_connections)
+        # marks configurations which have to be probed again when they fail:
+        configuration.from_session_cache = True
+        # the verified password hash is reused by save_session_cache():
+        configuration.session_cache = cached
+        return configuration
+
+    service_endpoint = getattr(config, 'SERVICE_ENDPOINT', None)
+    if service_endpoint:
+        # Explicit EWS URL, e.g. of a local test server:
+        return exchangelib.Configuration(credentials, service_endpoint=service_endpoint, max_connections=max_connections)
+    return exchangelib.Configuration(credentials, server=config.EXCHANGE_SERVER, max_connections=max_connections)
+
+
+def session_cache_filename(config):
+    """
+    Returns the name of the file of --session-cache for a configuration.
+    It contains a hash of the server and the user, so each account has
+    its own file. The password is not part of the name, see
+    session_cache_password_hash().
+
+    @param config: the configuration module or an object with the same attributes
+    """
+    settings = [config.EXCHANGE_SERVER, getattr(config, 'SERVICE_ENDPOINT', None), config.USERNAME]
+    digest = hashlib.sha256(json.dumps(settings).encode('utf-8')).hexdigest()
+    return os.path.join(SESSION_CACHE_DIR, 'session-' + digest[:32] + '.json')
+
+
+def session_cache_password_hash(config, salt):
+    """
+    Returns the salted hash of the password which is stored in the file
+    of --session-cache. Cached settings are only used with the password
+    they were written with, so changing it invalidates them. The salt
+    and the iterations make guessing the password from the file costly.
+
+    @param config: the configuration module or an object with the same attributes
+    @param salt: hex string of random bytes stored next to the hash
+    @param return: hex string
+    """
+    return hashlib.pbkdf2_hmac('sha256', config.PASSWORD.encode('utf-8'), bytes.fromhex(salt),
+                               SESSION_CACHE_PASSWORD_ITERATIONS).hex()
+
+
+def load_session_cache(config):
+    """
+    Returns the cached session settings of a configuration or None.
+
+    @param config: the configuration module or an object with the same attributes
+    @param return: dict with service_endpoint, auth_type, build and api_version or None
+    """
+    try:
+        with open(session_cache_filename(config), 'r') as cachehandle:
+            cached = json.load(cachehandle)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cached, dict) or cached.get('version') != SESSION_CACHE_VERSION:
+        return None
+    try:
+        if session_cache_password_hash(config, cached['salt']) != cached['password_hash']:
+            logging.debug('session cache was written with another password')
+            return None
+    except (KeyError, TypeError, ValueError):
+        return None
+    return cached
+
+
+def save_session_cache(config, protocol, cached=None):
+    """
+    Caches the EWS URL, the authentication type and the server version
+    which exchangelib determined for a configuration. The file is only
+    readable by the user since it reveals details of the account.
+
+    The salted password hash is costly to compute on purpose, so it is
+    computed at most once per run: the file is only read by
+    exchange_configuration() and its verified hash is reused here.
+
+    @param config: the configuration module or an object with the same attributes
+    @param protocol: the exchangelib protocol of a successfully used account
+    @param cached: the settings of load_session_cache() the account was
+                   connected with or None if it was probed
+    """
+
+    version = protocol.version
+    build = version.build
+    settings = {'service_endpoint': protocol.service_endpoint,
+                'auth_type': protocol.auth_type,
+                'build': [build.major_version, build.minor_version, build.major_build, build.minor_build] if build else None,
+                'api_version': version.api_version}
+    if cached:
+        if all(cached.get(name) == value for name, value in settings.items()):
+            return
+        salt, password_hash = cached['salt'], cached['password_hash']
+    else:
+        salt = os.urandom(16).hex()
+        password_hash = session_cache_password_hash(config, salt)
+    cached = dict(settings, version=SESSION_CACHE_VERSION, salt=salt, password_hash=password_hash)
+
+    filename = session_cache_filename(config)
+    try:
+        os.makedirs(SESSION_CACHE_DIR, mode=0o700, exist_ok=True)
+        handle, tempfilename = tempfile.mkstemp(prefix='.session-', dir=SESSION_CACHE_DIR)
+        with os.fdopen(handle, 'w') as cachehandle:
+            json.dump(cached, cachehandle)
+        os.replace(tempfilename, filename)
+    except OSError as e:
+        logging.warning('Could not write the session cache "' + filename + '": ' + str(e))
+        return
+    logging.debug('session settings cached in ' + filename)
+
+
+def remove_session_cache(config):
+    """
+    Removes the cached session settings of a configuration.
+
+    @param config: the configuration module or an object with the same attributes
+    """
+    try:
+        os.remove(session_cache_filename(config))
+    except FileNotFoundError:
+        pass
+
+
+def is_session_cache_error(error):
+    """
+    Returns whether an exception may be caused by outdated settings of
+    --session-cache: a failed authentication, an unsupported server
+    version or a failing connection to the cached EWS URL.
+
+    @param error: the exception
+    @param return: boolean
+    """
+    import_exchangelib()
+    errors = exchangelib.errors
+    if isinstance(error, (errors.UnauthorizedError, errors.ErrorInvalidServerVersion,
+                          errors.ErrorIncorrectSchemaVersion, errors.ErrorInvalidSchemaVersionForMailboxVersion)):
+        return True
+    # All other errors of the responses of the server are derived from TransportError as well:
+    return isinstance(error, errors.TransportError) and not isinstance(error, errors.ResponseMessageError)
+
+
+def is_transient_error(error):
+    """
+    Returns whether an exception is caused by temporary network or
+    server problems and is worth a retry.
+
+    @param error: the exception
+    @param return: boolean
+    """
+    import_exchangelib()
+    errors = exchangelib.errors
+    if isinstance(error, (errors.ErrorTimeoutExpired, errors.ErrorServerBusy, errors.ErrorInternalServerTransientError,
+                          errors.ErrorConnectionFailed, errors.ErrorMailboxStoreUnavailable)):
+        return True
+    # All other errors of the responses of the server are derived from TransportError as well:
+    return isinstance(error, (errors.TransportError, ConnectionError)) and \
+        not isinstance(error, errors.ResponseMessageError)
+
+
+def batch_configurations(configuration):
+    """
+    Returns one configuration object per entry of ACCOUNTS of the
+    configuration file. Each entry is a dict which overrides the
+    global settings of the configuration file and has to contain at
+    least PRIMARY_SMTP_ADDRESS and OUTPUTFILE.
+
+    @param configuration: the configuration module
+    @param return: list of objects with the attributes of the configuration module
+    """
+
+    accounts = getattr(configuration, 'ACCOUNTS', None)
+    if not accounts:
+        error_exit(3, 'Option "--batch" requires a non-empty list ACCOUNTS in the configuration file.')
+
+    defaults = {key: getattr(configuration, key) for key in dir(configuration) if key.isupper()}
+    configurations = []
+    for account in accounts:
+        for key in ['PRIMARY_SMTP_ADDRESS', 'OUTPUTFILE']:
+            if key not in account:
+                error_exit(3, 'Entry of ACCOUNTS in the configuration file lacks ' + key + ': ' + repr(account))
+        settings = dict(defaults)
+        settings.update(account)
+        settings['OUTPUTFILE'] = os.path.expanduser(settings['OUTPUTFILE'])
+        configurations.append(types.SimpleNamespace(**settings))
+
+    return configurations
+
+
+def dump_calendars_of_accounts(configuration, startday, endday):
+    """
+    Writes the calendars of all accounts of ACCOUNTS of the
+    configuration file to their output files. The accounts are
+    processed concurrently by --jobs worker threads. Accounts of the
+    same server, EWS endpoint and credentials share their HTTP sessions.
+
+    @param configuration: the configuration module
+    @param startday: list of year, month, day as integers
+    @param endday: list of year, month, day as integers
+    @param return: number of accounts which failed
+    """
+
+    configurations = batch_configurations(configuration)
+    jobs = max(1, options.jobs)
+
+    def connection_key(config):
+        return (config.EXCHANGE_SERVER, getattr(config, 'SERVICE_ENDPOINT', None), config.USERNAME, config.PASSWORD)
+
+    exchange_configs = {}
+    for config in configurations:
+        if connection_key(config) not in exchange_configs:
+            exchange_configs[connection_key(config)] = exchange_configuration(config, jobs * max_connections_per_account())
+
+    def dump_account(config):
+        starttime = time.time()
+        exchange2org = Exchange2Org(config, logging.getLogger(), exchange_config=exchange_configs[connection_key(config)])
+        number_of_events = exchange2org.dump_calendar(startday=startday, endday=endday, outputfilename=config.OUTPUTFILE)
+        return number_of_events, time.time() - starttime
+
+    import concurrent.futures
+    number_of_failures = 0
+    starttime = time.time()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(dump_account, config) for config in configurations]
+        for config, future in zip(configurations, futures):
+            try:
+                number_of_events, duration = future.result()
+            except Exception as e:
+                number_of_failures += 1
+                logging.error(config.PRIMARY_SMTP_ADDRESS + ': failed: ' + repr(e))
+            else:
+                logging.info(config.PRIMARY_SMTP_ADDRESS + ': ' + str(number_of_events) +
+                             ' events in %.2f seconds' % duration)
+
+    logging.info(str(len(configurations)) + ' accounts processed in %.2f seconds' % (time.time() - starttime) +
+                 (' (' + str(number_of_failures) + ' failed)' if number_of_failures else ''))
+
+    return number_of_failures
+
+
+def freebusy_addresses():
+    """
+    Returns the e-mail addresses of --freebusy without duplicates.
+
+    @param return: list of e-mail addresses
+    """
+
+    addresses = []
+    for argument in options.freebusy:
+        for address in argument.split(','):
+            address = address.strip()
+            if address and address.lower() not in [known.lower() for known in addresses]:
+                addresses.append(address)
+    return addresses
+
+
+def handle_date_or_period_argument(daystring, future):
+    """
+    Gets a string containing either a 'YYYY-MM-DD' ISO day format
+    or an integer. Returns a list of year, month, day of the ISO day
+    or (in case of an integer) a similar list with number of days in
+    the past or the future - according to the 2nd parameter.
+
+    @param daystring: string with either 'YYYY-MM-DD' format or an integer
+    @param furure: boolean
+    @param endday: list of year, month, day as integers
+    """
+
+    # check format: integer or ISO date string?
+    components = re.match(DAY_STRING_REGEX, daystring)
+    if components:
+        # parameter was of format YYYY-MM-DD
+        return [int(components.group(1)), int(components.group(2)), int(components.group(3))]
+    else:
+        # parameter might be an integer:
+        try:
+            number_of_days = int(daystring)
+        except:
+            error_exit(2, 'Format of daystring parameter must be "YYYY-MM-DD" or an integer.')
+        if future:
+            delta_days = number_of_days
+        else:
+            delta_days = -number_of_days
+        daystring_datetime = datetime.datetime.now() + datetime.timedelta(days=delta_days)
+        return [daystring_datetime.year, daystring_datetime.month, daystring_datetime.day]
+
+
+def time_range_from_options():
+    """
+    Returns the start day and the end day according to --startday and
+    --endday. Relative days are relative to the current day.
+
+    @param return: tuple of two lists of year, month, day as integers
+    """
+
+    # The defaults are: ±60 days
+    before_60_days = datetime.datetime.now() + datetime.timedelta(days=-60)
+    startday = [before_60_days.year, before_60_days.month, before_60_days.day]
+    in_60_days = datetime.datetime.now() + datetime.timedelta(days=60)
+    endday = [in_60_days.year, in_60_days.month, in_60_days.day]
+
+    if options.startday:
+        startday = handle_date_or_period_argument(options.startday[0], future=False)
+        logging.debug('options.startday found and set to ' + repr(startday))
+    if options.endday:
+        endday = handle_date_or_period_argument(options.endday[0], future=True)
+        logging.debug('options.endday found and set to ' + repr(endday))
+
+    return startday, endday
+
+
+def load_configuration():
+    """
+    Imports the configuration file from its hard-coded path.
+
+    @param return: the configuration module
+    """
+
+    logging.debug('Looking for the configuration file which is expected to be found on a hard-coded path')
+    sys.path.insert(0, CONFIGDIR)  # add CONFIGDIR to Python path in order to find config file
+    try:
+        import exchange2orgconfig
+    except ImportError:
+        print('Could not find file  "' + os.path.join(CONFIGDIR, 'exchange2orgconfig.py') + '".' +
               '\nPlease take a look at "exchange2orgconfig-TEMPLATE.py", copy it, and configure accordingly.')
         sys.exit(1)
 
-    # So far, we only handle calendar events. Maybe the future will bring more:
-    if options.calendar:
-        exchange2org = Exchange2Org(exchange2orgconfig, logging.getLogger())
-        exchange2org.dump_calendar(startday=startday, endday=endday)
-    else:
-        logging.info('Sorry, at the moment this tool only supports calendar events. So please use the --calendar parameter.')
+    return exchange2orgconfig
+
+
+def check_configuration():
+    """
+    Validates the configuration file without connecting to the server:
+    syntax and assert statements, presence and types of all settings,
+    the time zone and the entries of ACCOUNTS.
+
+    @param return: list of strings describing the errors found
+    """
+
+    try:
+        config = load_configuration()
+    except AssertionError as e:
+        import traceback
+        return ['assert statement of the configuration file failed: ' + traceback.extract_tb(e.__traceback__)[-1].line]
+    except Exception as e:
+        return ['the configuration file could not be loaded: ' + repr(e)]
+
+    errors = []
+    for name, allowed_types, required in CONFIGURATION_SETTINGS:
+        if not hasattr(config, name):
+            if required:
+                errors.append(name + ' is missing')
+        elif not isinstance(getattr(config, name), allowed_types):
+            errors.append(name + ' has to be of type ' + ' or '.join(t.__name__ for t in allowed_types) +
+                          ' but is ' + repr(getattr(config, name)))
+
+    if isinstance(getattr(config, 'TIMEZONE', None), str):
+        import zoneinfo
+        try:
+            zoneinfo.ZoneInfo(config.TIMEZONE)
+        except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+            errors.append('TIMEZONE is no valid ISO time-zone: ' + repr(config.TIMEZONE))
+
+    template = getattr(config, 'ENTRY_TEMPLATE', None)
+    if isinstance(template, str) and not ENTRY_TEMPLATE_FIELD_REGEX.search(template):
+        errors.append('ENTRY_TEMPLATE does not contain any field: ' + repr(template))
+
+    for field in getattr(config, 'RICH_FIELDS', None) or []:
+        if field not in RICH_FIELDS:
+            errors.append('RICH_FIELDS contains unknown field ' + repr(field) + ', known fields are: ' +
+                          ', '.join(sorted(RICH_FIELDS)))
+
+    for account in getattr(config, 'ACCOUNTS', None) or []:
+        if not isinstance(account, dict):
+            errors.append('entry of ACCOUNTS is not a dict: ' + repr(account))
+            continue
+        for key in ['PRIMARY_SMTP_ADDRESS', 'OUTPUTFILE']:
+            if key not in account:
+                errors.append('entry of ACCOUNTS lacks ' + key + ': ' + repr(account))
+
+    return errors
+
+
+def main():
+    """Main function"""
+
+    global options
+    options = parser.parse_args()
+
+    handle_logging()
+
+    if options.verbose and options.quiet:
+        error_exit(1, "Options \"--verbose\" and \"--quiet\" found. " +
+                   "This does not make any sense, you silly fool :-)")
+
+    if options.check_config:
+        errors = check_configuration()
+        for error in errors:
+            logging.error('Configuration file: ' + error)
+        if errors:
+            sys.exit(3)
+        logging.info('Configuration file "' + os.path.join(CONFIGDIR, 'exchange2orgconfig.py') + '" is OK.')
+        return
+
+    startday, endday = time_range_from_options()
+
+    if options.dryrun:
+        logging.debug("DRYRUN active, not changing any files")
+
+    if options.batch and options.outputfile:
+        error_exit(1, "With option \"--batch\", the output files are defined by ACCOUNTS in the configuration file.")
+    elif not options.batch and not options.outputfile:
+        error_exit(1, "Please specify the output file FILE.")
+
+    if options.page_size is not None and options.page_size < 1:
+        error_exit(1, "Option \"--page-size\" needs a positive number.")
+
+    if options.shard and (options.incremental or options.repeaters):
+        error_exit(1, "Option \"--shard\" can not be combined with \"--incremental\" or \"--repeaters\".")
+
+    if options.freeze_past and not options.shard:
+        error_exit(1, "Option \"--freeze-past\" requires \"--shard\".")
+
+    if options.repeaters and options.incremental:
+        error_exit(1, "Options \"--repeaters\" and \"--incremental\" can not be combined.")
+
+    if options.watch and options.batch:
+        error_exit(1, "Options \"--watch\" and \"--batch\" can not be combined.")
+
+    if options.render_workers > 1 and (options.batch or options.watch or options.shard or options.repeaters or
+                                       options.incremental or options.render_cache or options.backfill):
+        error_exit(1, "Option \"--render-workers\" can not be combined with \"--batch\", \"--watch\", \"--shard\", " +
+                   "\"--repeaters\", \"--incremental\", \"--render-cache\" or \"--backfill\".")
+
+    if options.backfill and (options.batch or options.watch or options.shard or options.repeaters or
+                             options.incremental or options.render_cache or options.fetch_window):
+        error_exit(1, "Option \"--backfill\" can not be combined with \"--batch\", \"--watch\", \"--shard\", " +
+                   "\"--repeaters\", \"--incremental\", \"--render-cache\" or \"--fetch-window\".")
+
+    if [options.calendar, options.tasks, bool(options.mail), bool(options.freebusy)].count(True) > 1:
+        error_exit(1, "Only one of the options \"--calendar\", \"--tasks\", \"--mail\" and \"--freebusy\" " +
+                   "can be used at once.")
+
+    if (options.tasks or options.mail or options.freebusy) and \
+       (options.batch or options.watch or options.shard or options.repeaters or options.incremental or
+        options.render_cache or options.fetch_window or options.backfill or options.render_workers > 1):
+        error_exit(1, "Options \"--batch\", \"--watch\", \"--shard\", \"--repeaters\", \"--incremental\", " +
+                   "\"--render-cache\", \"--fetch-window\", \"--backfill\" and \"--render-workers\" are only supported with \"--calendar\".")
+
+    if options.flagged and not options.mail:
+        error_exit(1, "Option \"--flagged\" requires \"--mail\".")
+
+    exchange2orgconfig = load_configuration()
+
+    global statistics
+    if options.stats or options.stats_file:
+        statistics = Statistics()
+        install_request_counter()
+
+    try:
+        dispatch(exchange2orgconfig, startday, endday)
+    finally:
+        if statistics:
+            if options.stats:
+                statistics.log(logging.getLogger())
+            if options.stats_file:
+                with open(options.stats_file, 'w') as statshandle:
+                    json.dump(statistics.report(), statshandle, indent=2)
 
     if not options.quiet:
         # add empty line for better screen output readability
@@ -436,6 +3597,40 @@ def main():
 
     logging.debug('successfully finished.')
 
+
+def dispatch(exchange2orgconfig, startday, endday):
+    """
+    Runs the action selected by the command line arguments.
+
+    @param exchange2orgconfig: the configuration module
+    @param startday: list of year, month, day as integers
+    @param endday: list of year, month, day as integers
+    """
+
+    if options.calendar and options.batch:
+        if dump_calendars_of_accounts(exchange2orgconfig, startday=startday, endday=endday):
+            error_exit(4, 'Not all accounts could be processed.')
+    elif options.calendar and options.watch:
+        exchange2org = Exchange2Org(exchange2orgconfig, logging.getLogger())
+        exchange2org.watch_calendar(time_range=time_range_from_options, outputfilename=options.outputfile)
+    elif options.calendar:
+        exchange2org = Exchange2Org(exchange2orgconfig, logging.getLogger())
+        exchange2org.dump_calendar(startday=startday, endday=endday, outputfilename=options.outputfile)
+    elif options.tasks:
+        exchange2org = Exchange2Org(exchange2orgconfig, logging.getLogger())
+        exchange2org.dump_tasks(startday=startday, endday=endday, outputfilename=options.outputfile)
+    elif options.mail:
+        exchange2org = Exchange2Org(exchange2orgconfig, logging.getLogger())
+        exchange2org.dump_mail(folder=options.mail, startday=startday, endday=endday, outputfilename=options.outputfile)
+    elif options.freebusy:
+        exchange2org = Exchange2Org(exchange2orgconfig, logging.getLogger())
+        exchange2org.dump_freebusy(addresses=freebusy_addresses(), startday=startday, endday=endday,
+                                   outputfilename=options.outputfile)
+    else:
+        logging.info('Please use the --calendar, --tasks, --mail or --freebusy parameter in order to select ' +
+                     'what to extract.')
+
+
 if __name__ == "__main__":
     try:
         main()
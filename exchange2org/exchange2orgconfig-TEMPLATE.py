@@ -13,6 +13,12 @@
 # Server to connect to. Like: 'mail.example.com'
 EXCHANGE_SERVER = 'mail.example.com'
 
+# Optional URL of the EWS endpoint which is used instead of
+# EXCHANGE_SERVER. Useful for servers with non-standard paths or for
+# testing against a local server. Like:
+# 'https://mail.example.com/EWS/Exchange.asmx'
+SERVICE_ENDPOINT = None
+
 # Domain and username like 'MYDOMAIN\\firstname.lastname'
 USERNAME = 'MYDOMAIN\\firstname.lastname'
 # In some cases (e.g. Office365) you only need your e-mail address. Try and
@@ -61,6 +67,39 @@ WRITE_PROPERTIES_DRAWER = True
 WRITE_SCHEDULED = True
 WRITE_DEADLINE = False
 
+# Optional template of each Org-mode entry which replaces the default
+# output defined by OUTLOOK_HYPERLINK, WRITE_SCHEDULED, WRITE_DEADLINE and
+# WRITE_PROPERTIES_DRAWER. Fields in curly braces are replaced by their
+# values: timestamp, subject, location, link, entry_id, date_range,
+# debug, organizer, attendees and body. Text within the braces before
+# and after the field name is only written if the value is not empty,
+# like the parentheses of "{ (location)}". Example:
+# ENTRY_TEMPLATE = '** {timestamp}{ subject}{ (location)}\nSCHEDULED: {date_range}\n'
+ENTRY_TEMPLATE = None
+
+# Optional list of additional fields of the default output: 'organizer'
+# and 'attendees' are written to the PROPERTIES drawer, 'body' below
+# it. They are fetched in a second step only for events which are not
+# omitted. ENTRY_TEMPLATE may use them as fields as well. Example:
+# RICH_FIELDS = ['organizer', 'attendees', 'body']
+RICH_FIELDS = []
+
+# Maximum number of events kept in the cache of "--render-cache".
+# Least recently used events are evicted first.
+RENDER_CACHE_MAX_ENTRIES = 20000
+
+# Accounts processed by "--batch" within one process. Each entry is a
+# dict which overrides the settings above for this account. Each entry
+# needs at least PRIMARY_SMTP_ADDRESS and OUTPUTFILE. Accounts with the
+# same EXCHANGE_SERVER, SERVICE_ENDPOINT, USERNAME and PASSWORD share
+# their connections.
+ACCOUNTS = [
+    # {'PRIMARY_SMTP_ADDRESS': 'meeting.room@example.com',
+    #  'OUTPUTFILE': '~/org/meeting-room.org',
+    #  'CATEGORY': 'room',
+    #  'TAGS': ['OUTLOOK', 'room']},
+]
+
 # ===================================================================== ##
 #                                                                       ##
 #  These are INTERNAL configuration settings.                           ##
@@ -84,6 +123,9 @@ assert type(TAGS) == list
 assert type(OUTLOOK_HYPERLINK) == str
 assert type(OMIT_SUBJECTS) == list
 assert type(WRITE_PROPERTIES_DRAWER) == bool
+assert type(RICH_FIELDS) == list
+assert type(ACCOUNTS) == list
+assert type(RENDER_CACHE_MAX_ENTRIES) == int
 
 # END OF FILE #################################################################
 # Local Variables:
@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+
+"""
+A local HTTP server which answers the EWS requests of exchange2org
+like an Exchange server with one calendar: the probing of the
+authentication type and of the server version, GetFolder, FindItem
+with calendar views, GetItem and pull subscriptions with Subscribe,
+GetEvents and Unsubscribe. Requests have to use basic authentication
+with the credentials given to the server.
+
+Tests change events with modify(), which reports the change to the
+subscriptions, and inject errors with fail_next() and drop_next().
+"""
+
+import base64
+import datetime
+import http.server
+import importlib.util
+import itertools
+import os
+import threading
+
+from lxml import etree
+
+SOAP = 'http://schemas.xmlsoap.org/soap/envelope/'
+MESSAGES = 'http://schemas.microsoft.com/exchange/services/2006/messages'
+TYPES = 'http://schemas.microsoft.com/exchange/services/2006/types'
+
+TEMPLATE_CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                               'exchange2org', 'exchange2orgconfig-TEMPLATE.py')
+
+RESPONSE = ('<?xml version="1.0" encoding="utf-8"?>'
+            '<s:Envelope xmlns:s="' + SOAP + '">'
+            '<s:Header><h:ServerVersionInfo xmlns:h="' + TYPES + '" MajorVersion="15" MinorVersion="1"'
+            ' MajorBuildNumber="2507" MinorBuildNumber="6" Version="Exchange2016"/></s:Header>'
+            '<s:Body><m:{operation}Response xmlns:m="' + MESSAGES + '" xmlns:t="' + TYPES + '">'
+            '<m:ResponseMessages>{messages}</m:ResponseMessages>'
+            '</m:{operation}Response></s:Body></s:Envelope>')
+
+CALENDAR_FOLDER = ('<t:CalendarFolder><t:FolderId Id="calendar" ChangeKey="1"/>'
+                   '<t:ParentFolderId Id="root" ChangeKey="1"/><t:FolderClass>IPF.Appointment</t:FolderClass>'
+                   '<t:DisplayName>Calendar</t:DisplayName><t:TotalCount>{count}</t:TotalCount>'
+                   '<t:ChildFolderCount>0</t:ChildFolderCount></t:CalendarFolder>')
+
+ROOT_FOLDER = ('<t:Folder><t:FolderId Id="root" ChangeKey="1"/><t:DisplayName>Root</t:DisplayName>'
+               '<t:TotalCount>0</t:TotalCount><t:ChildFolderCount>1</t:ChildFolderCount></t:Folder>')
+
+
+def load_template_config():
+    """
+    Returns the configuration template as a module.
+    """
+    spec = importlib.util.spec_from_file_location('exchange2orgconfig', TEMPLATE_CONFIG)
+    config = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(config)
+    return config
+
+
+def configuration(server, username, password):
+    """
+    Returns the configuration template with the EWS URL of the server and the credentials.
+    """
+    config = load_template_config()
+    config.SERVICE_ENDPOINT = server.service_endpoint
+    config.USERNAME = username
+    config.PASSWORD = password
+    return config
+
+
+def item_id(number):
+    """
+    Returns an item ID like the ones of the server, which contain the entry ID of OUTLOOK_HYPERLINK.
+    """
+    return base64.b64encode(bytes(4) + number.to_bytes(4, 'big') * 17).decode()
+
+
+def ews_datetime(value):
+    return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def parse_datetime(value):
+    return datetime.datetime.fromisoformat(value.replace('Z', '+00:00')).astimezone(datetime.timezone.utc)
+
+
+def escape(text):
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def message(operation, content='', error=None):
+    """
+    Returns the response message of an operation, which reports the error code if given.
+    """
+    if error:
+        return ('<m:' + operation + 'ResponseMessage ResponseClass="Error"><m:MessageText>' + error +
+                '</m:MessageText><m:ResponseCode>' + error + '</m:ResponseCode>'
+                '<m:DescriptiveLinkKey>0</m:DescriptiveLinkKey></m:' + operation + 'ResponseMessage>')
+    return ('<m:' + operation + 'ResponseMessage ResponseClass="Success"><m:ResponseCode>NoError</m:ResponseCode>' +
+            content + '</m:' + operation + 'ResponseMessage>')
+
+
+class FakeEvent:
+    """
+    A single event of the calendar.
+    """
+
+    def __init__(self, number, subject, start, end, location=None):
+        self.id = item_id(number)
+        self.changekey = 1
+        self.subject = subject
+        self.start = start
+        self.end = end
+        self.location = location
+
+    def to_xml(self):
+        return ('<t:CalendarItem><t:ItemId Id="' + self.id + '" ChangeKey="' + str(self.changekey) + '"/>'
+                '<t:Subject>' + escape(self.subject) + '</t:Subject>'
+                '<t:Start>' + ews_datetime(self.start) + '</t:Start><t:End>' + ews_datetime(self.end) + '</t:End>'
+                '<t:IsAllDayEvent>false</t:IsAllDayEvent><t:IsCancelled>false</t:IsCancelled>'
+                '<t:LegacyFreeBusyStatus>Busy</t:LegacyFreeBusyStatus>' +
+                ('<t:Location>' + escape(self.location) + '</t:Location>' if self.location else '') +
+                '<t:CalendarItemType>Single</t:CalendarItemType></t:CalendarItem>')
+
+
+class FakeEWSServer(http.server.ThreadingHTTPServer):
+    """
+    The EWS endpoint on a free port of localhost, which is served by a
+    background thread after start().
+    """
+
+    daemon_threads = True
+
+    def __init__(self, username, password, events):
+        super().__init__(('127.0.0.1', 0), FakeEWSHandler)
+        self.credentials = 'Basic ' + base64.b64encode((username + ':' + password).encode()).decode()
+        self.events = {event.id: event for event in events}
+        self.lock = threading.Lock()
+        # operations of all authenticated requests and the errors injected into them:
+        self.requests = []
+        self.errors = []
+        self.failures = {}
+        self.drops = {}
+        # watermark numbers of the changes and the subscriptions:
+        self.changes = []
+        self.subscriptions = {}
+        self.subscription_ids = itertools.count(1)
+
+    @property
+    def service_endpoint(self):
+        return 'http://127.0.0.1:' + str(self.server_address[1]) + '/EWS/Exchange.asmx'
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name='fake-ews', daemon=True).start()
+
+    def count(self, operation):
+        with self.lock:
+            return self.requests.count(operation)
+
+    def modify(self, event, **fields):
+        """
+        Changes fields of an event and reports the change to the subscriptions.
+        """
+        with self.lock:
+            for name, value in fields.items():
+                setattr(event, name, value)
+            event.changekey += 1
+            self.changes.append(event.id)
+
+    def fail_next(self, operation, error):
+        """
+        Makes the next request of the operation fail with the error code, like 'ErrorServerBusy'.
+        """
+        with self.lock:
+            self.failures[operation] = error
+
+    def drop_next(self, operation):
+        """
+        Makes the server close the connection of the next request of the operation without a response.
+        """
+        with self.lock:
+            self.drops[operation] = True
+
+    def respond(self, operation, request):
+        """
+        Returns the response messages of an operation.
+
+        @param request: the XML element of the operation in the SOAP body
+        @param return: string or None to close the connection without a response
+        """
+
+        with self.lock:
+            self.requests.append(operation)
+            if self.drops.pop(operation, False):
+                self.errors.append(operation + ': dropped')
+                return None
+            error = self.failures.pop(operation, None)
+            if error:
+                self.errors.append(operation + ': ' + error)
+                return message(operation, error=error)
+            method = getattr(self, operation.lower(), None)
+            if not method:
+                return message(operation, error='ErrorInvalidRequest')
+            return method(request)
+
+    def convertid(self, request):
+        # only used for probing the server version
+        return message('ConvertId', error='ErrorInvalidIdMalformed')
+
+    def getfolder(self, request):
+        messages = ''
+        for folder in request.find('{%s}FolderIds' % MESSAGES):
+            folder_id = folder.get('Id')
+            if folder_id == 'calendar':
+                content = CALENDAR_FOLDER.format(count=len(self.events))
+            elif folder_id in ('root', 'msgfolderroot'):
+                content = ROOT_FOLDER
+            else:
+                messages += message('GetFolder', error='ErrorFolderNotFound')
+                continue
+            messages += message('GetFolder', '<m:Folders>' + content + '</m:Folders>')
+        return messages
+
+    def finditem(self, request):
+        view = request.find('{%s}CalendarView' % MESSAGES)
+        if view is None:
+            return message('FindItem', error='ErrorInvalidRequest')
+        start = parse_datetime(view.get('StartDate'))
+        end = parse_datetime(view.get('EndDate'))
+        events = sorted((event for event in self.events.values() if event.end >= start and event.start < end),
+                        key=lambda event: event.start)
+        return message('FindItem', '<m:RootFolder TotalItemsInView="' + str(len(events)) +
+                       '" IncludesLastItemInRange="true"><t:Items>' + ''.join(event.to_xml() for event in events) +
+                       '</t:Items></m:RootFolder>')
+
+    def getitem(self, request):
+        messages = ''
+        for item in request.find('{%s}ItemIds' % MESSAGES):
+            event = self.events.get(item.get('Id'))
+            if event:
+                messages += message('GetItem', '<m:Items>' + event.to_xml() + '</m:Items>')
+            else:
+                messages += message('GetItem', error='ErrorItemNotFound')
+        return messages
+
+    def subscribe(self, request):
+        if request.find('{%s}PullSubscriptionRequest' % MESSAGES) is None:
+            return message('Subscribe', error='ErrorInvalidRequest')
+        subscription_id = 'subscription' + str(next(self.subscription_ids))
+        self.subscriptions[subscription_id] = len(self.changes)
+        return message('Subscribe', '<m:SubscriptionId>' + subscription_id + '</m:SubscriptionId>'
+                       '<m:Watermark>' + str(len(self.changes)) + '</m:Watermark>')
+
+    def getevents(self, request):
+        subscription_id = request.findtext('{%s}SubscriptionId' % MESSAGES)
+        if subscription_id not in self.subscriptions:
+            return message('GetEvents', error='ErrorSubscriptionNotFound')
+        first = int(request.findtext('{%s}Watermark' % MESSAGES))
+        timestamp = '<t:TimeStamp>' + ews_datetime(datetime.datetime.now(datetime.timezone.utc)) + '</t:TimeStamp>'
+        events = ''.join('<t:ModifiedEvent><t:Watermark>' + str(number + 1) + '</t:Watermark>' + timestamp +
+                         '<t:ItemId Id="' + changed_id + '" ChangeKey="0"/>'
+                         '<t:ParentFolderId Id="calendar" ChangeKey="1"/></t:ModifiedEvent>'
+                         for number, changed_id in enumerate(self.changes) if number >= first)
+        if not events:
+            events = '<t:StatusEvent><t:Watermark>' + str(first) + '</t:Watermark></t:StatusEvent>'
+        return message('GetEvents', '<m:Notification><t:SubscriptionId>' + subscription_id + '</t:SubscriptionId>'
+                       '<t:PreviousWatermark>' + str(first) + '</t:PreviousWatermark>'
+                       '<t:MoreEvents>false</t:MoreEvents>' + events + '</m:Notification>')
+
+    def unsubscribe(self, request):
+        self.subscriptions.pop(request.findtext('{%s}SubscriptionId' % MESSAGES), None)
+        return message('Unsubscribe')
+
+
+class FakeEWSHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Handles the SOAP requests of one HTTP connection.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.headers.get('Authorization') != self.server.credentials:
+            self.send_response(401)
+            self.send_header('WWW-Authenticate', 'Basic realm="fake-ews"')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        request = etree.fromstring(body).find('{%s}Body' % SOAP)[0]
+        operation = etree.QName(request).localname
+        messages = self.server.respond(operation, request)
+        if messages is None:
+            self.close_connection = True
+            return
+
+        response = RESPONSE.format(operation=operation, messages=messages).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/xml; charset=utf-8')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests of the local expansion of recurring series of --repeaters.
+
+Run with: python -m unittest discover tests
+"""
+
+import datetime
+import logging
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import exchange2org  # noqa: E402
+from fakeews import item_id, load_template_config  # noqa: E402
+
+
+class FakeAccount:
+    """
+    Returns modified occurrences like GetItem requests of exchangelib.Account.fetch().
+    """
+
+    def __init__(self, items):
+        self.items = {item.id: item for item in items}
+        self.fetched = []
+
+    def fetch(self, ids, only_fields=None, chunk_size=None):
+        self.fetched.extend(itemid for itemid, changekey in ids)
+        return [self.items[itemid] for itemid, changekey in ids]
+
+
+class RecurrenceTest(unittest.TestCase):
+
+    def setUp(self):
+        exchange2org.options = exchange2org.parser.parse_args(['--calendar', '--repeaters', 'calendar.org'])
+        self.account = FakeAccount([])
+        self.exchange = exchange2org.Exchange2Org(load_template_config(), logging.getLogger('test'),
+                                                  account=self.account)
+        self.exchangelib = exchange2org.exchangelib
+        self.tz = self.exchange.tz
+
+    def local(self, *args):
+        """Returns an EWSDateTime in UTC like the server from the local date and time."""
+        return self.exchangelib.EWSDateTime(*args, tzinfo=self.tz).astimezone(self.exchangelib.UTC)
+
+    def recurrence(self, pattern, start, end=None, number=None):
+        recurrence = self.exchangelib.recurrence
+        if end:
+            boundary = recurrence.EndDatePattern(start=start, end=end)
+        elif number:
+            boundary = recurrence.NumberedPattern(start=start, number=number)
+        else:
+            boundary = recurrence.NoEndPattern(start=start)
+        return recurrence.Recurrence(pattern=pattern, boundary=boundary)
+
+    def days(self, recurrence, first_day):
+        return [day.isoformat() for day in self.exchange.recurrence_days(recurrence, first_day)]
+
+    def master(self, pattern, start, end, **fields):
+        fields.setdefault('recurrence', self.recurrence(pattern, start.astimezone(self.tz).date()))
+        return self.exchangelib.CalendarItem(id=item_id(1), changekey='master', subject='Series',
+                                             start=start, end=end, is_all_day=False, is_cancelled=False,
+                                             type='RecurringMaster', **fields)
+
+    def test_weekly_days(self):
+        pattern = self.exchangelib.recurrence.WeeklyPattern(interval=2, weekdays=[1, 3, 5], first_day_of_week=1)
+        # starts on a Wednesday, so the Monday of the first week is skipped:
+        recurrence = self.recurrence(pattern, datetime.date(2026, 10, 7), end=datetime.date(2026, 10, 30))
+        self.assertEqual(self.days(recurrence, datetime.date(2026, 10, 7)),
+                         ['2026-10-07', '2026-10-09', '2026-10-19', '2026-10-21', '2026-10-23'])
+
+    def test_relative_day_of_month(self):
+        self.assertEqual(self.exchange.relative_day_of_month(2026, 1, 2, 2), datetime.date(2026, 1, 13))
+        self.assertEqual(self.exchange.relative_day_of_month(2026, 1, 5, 5), datetime.date(2026, 1, 30))
+        # the first weekday and the last weekend day:
+        self.assertEqual(self.exchange.relative_day_of_month(2026, 8, 9, 1), datetime.date(2026, 8, 3))
+        self.assertEqual(self.exchange.relative_day_of_month(2026, 2, 10, 5), datetime.date(2026, 2, 28))
+
+    def test_relative_monthly_days(self):
+        pattern = self.exchangelib.recurrence.RelativeMonthlyPattern(interval=2, weekday=2, week_number=5)
+        recurrence = self.recurrence(pattern, datetime.date(2026, 1, 27), number=4)
+        self.assertEqual(self.days(recurrence, datetime.date(2026, 1, 27)),
+                         ['2026-01-27', '2026-03-31', '2026-05-26', '2026-07-28'])
+
+    def test_absolute_monthly_days_use_last_day_of_short_months(self):
+        pattern = self.exchangelib.recurrence.AbsoluteMonthlyPattern(interval=1, day_of_month=31)
+        recurrence = self.recurrence(pattern, datetime.date(2026, 1, 31), number=3)
+        self.assertEqual(self.days(recurrence, datetime.date(2026, 1, 31)),
+                         ['2026-01-31', '2026-02-28', '2026-03-31'])
+        self.assertIsNone(self.exchange.recurrence_repeater(
+            self.master(pattern, self.local(2026, 1, 31, 9), self.local(2026, 1, 31, 10))))
+
+    def test_repeater(self):
+        weekly = self.exchangelib.recurrence.WeeklyPattern(interval=2, weekdays=[1], first_day_of_week=1)
+        master = self.master(weekly, self.local(2026, 10, 5, 10), self.local(2026, 10, 5, 11))
+        self.assertEqual(self.exchange.recurrence_repeater(master), '+2w')
+        master.recurrence = self.recurrence(weekly, datetime.date(2026, 10, 5), end=datetime.date(2026, 12, 31))
+        self.assertIsNone(self.exchange.recurrence_repeater(master))
+        two_days = self.exchangelib.recurrence.WeeklyPattern(interval=1, weekdays=[1, 3], first_day_of_week=1)
+        master = self.master(two_days, self.local(2026, 10, 5, 10), self.local(2026, 10, 5, 11))
+        self.assertIsNone(self.exchange.recurrence_repeater(master))
+
+    def test_unsupported_pattern(self):
+        pattern = self.exchangelib.recurrence.DailyRegeneration(interval=3)
+        recurrence = self.recurrence(pattern, datetime.date(2026, 10, 5))
+        with self.assertRaises(ValueError):
+            next(self.exchange.recurrence_days(recurrence, datetime.date(2026, 10, 5)))
+
+    def test_deleted_and_modified_occurrences(self):
+        occurrences = self.exchangelib.items.calendar_item
+        moved = self.exchangelib.CalendarItem(id=item_id(2), changekey='moved', subject='Moved occurrence',
+                                              start=self.local(2026, 10, 21, 14), end=self.local(2026, 10, 21, 15),
+                                              is_all_day=False, is_cancelled=False, type='Exception')
+        self.account.items[moved.id] = moved
+        master = self.master(
+            self.exchangelib.recurrence.WeeklyPattern(interval=1, weekdays=[1], first_day_of_week=1),
+            self.local(2026, 9, 7, 10), self.local(2026, 9, 7, 11),
+            deleted_occurrences=[occurrences.DeletedOccurrence(start=self.local(2026, 10, 12, 10))],
+            modified_occurrences=[occurrences.Occurrence(id=moved.id, changekey=moved.changekey,
+                                                         start=moved.start, end=moved.end,
+                                                         original_start=self.local(2026, 10, 19, 10))])
+
+        entries = self.exchange.expand_recurring_series(master, self.local(2026, 10, 1), self.local(2026, 11, 15))
+        starts = [datetime.datetime.fromtimestamp(start, self.tz).strftime('%Y-%m-%d %H:%M')
+                  for start, entry in entries]
+
+        # single entries until the last modified occurrence, then one entry with a repeater:
+        self.assertEqual(starts, ['2026-10-05 10:00', '2026-10-26 10:00', '2026-10-21 14:00'])
+        self.assertNotIn('+1w', entries[0][1])
+        self.assertIn('<2026-10-26 Mon 10:00-11:00 +1w>', entries[1][1])
+        self.assertIn('Moved occurrence', entries[2][1])
+        self.assertEqual(self.account.fetched, [moved.id])
+
+    def test_daylight_saving_time(self):
+        # The summer time of Europe/Vienna ends on 2026-10-25:
+        master = self.master(
+            self.exchangelib.recurrence.DailyPattern(interval=1),
+            self.local(2026, 10, 23, 10), self.local(2026, 10, 23, 11),
+            recurrence=self.recurrence(self.exchangelib.recurrence.DailyPattern(interval=1),
+                                       datetime.date(2026, 10, 23), number=5))
+
+        entries = self.exchange.expand_recurring_series(master, self.local(2026, 10, 1), self.local(2026, 11, 1))
+        starts = [datetime.datetime.fromtimestamp(start, self.tz) for start, entry in entries]
+
+        self.assertEqual([start.strftime('%m-%d %H:%M') for start in starts],
+                         ['10-23 10:00', '10-24 10:00', '10-25 10:00', '10-26 10:00', '10-27 10:00'])
+        self.assertEqual([start.utcoffset() for start in (starts[1], starts[3])],
+                         [datetime.timedelta(hours=2), datetime.timedelta(hours=1)])
+        self.assertIn('<2026-10-26 Mon 10:00-11:00>', entries[3][1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tests of --watch against the local EWS server of fakeews.py.
+
+Run with: python -m unittest discover tests
+"""
+
+import datetime
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import exchange2org  # noqa: E402
+import fakeews  # noqa: E402
+
+USERNAME = 'EXAMPLE\\watcher'
+PASSWORD = 'secret'
+
+# Seconds a change may take to show up in the output file:
+TIMEOUT = 30
+
+
+def wait_for(condition, timeout=TIMEOUT):
+    """
+    Waits until the function returns True.
+
+    @param return: True if the condition was met within the timeout
+    """
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+class WatchTest(unittest.TestCase):
+    """
+    Runs --watch like main() in a background thread, which connects to
+    the fake server with SERVICE_ENDPOINT and the credentials of the
+    configuration. The thread runs until the end of the tests.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        now = datetime.datetime.now(datetime.timezone.utc).replace(minute=0, second=0, microsecond=0)
+        cls.events = [fakeews.FakeEvent(number, 'Event ' + str(number), now + datetime.timedelta(days=number),
+                                        now + datetime.timedelta(days=number, hours=1), 'Room ' + str(number))
+                      for number in range(1, 7)]
+        cls.server = fakeews.FakeEWSServer(USERNAME, PASSWORD, cls.events)
+        cls.server.start()
+
+        cls.directory = tempfile.mkdtemp()
+        cls.outputfilename = os.path.join(cls.directory, 'watch.org')
+        exchange2org.options = exchange2org.parser.parse_args(
+            ['--calendar', '--watch', '--watch-interval', '1', '--debounce', '2', '--startday', '7', '--endday', '30',
+             cls.outputfilename])
+        threading.Thread(target=exchange2org.dispatch, args=(fakeews.configuration(cls.server, USERNAME, PASSWORD),
+                                                             None, None), daemon=True).start()
+        if not wait_for(lambda: 'Event 6' in cls.output() and cls.server.count('Subscribe')):
+            raise AssertionError('--watch did not write the output file and subscribe')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory, ignore_errors=True)
+
+    @classmethod
+    def output(cls):
+        if not os.path.isfile(cls.outputfilename):
+            return ''
+        with open(cls.outputfilename, 'r', encoding='utf-8') as filehandle:
+            return filehandle.read()
+
+    def test_credentials(self):
+        # Only requests with the credentials of the configuration are answered:
+        self.assertTrue(self.server.count('FindItem'))
+        exchange = exchange2org.Exchange2Org(fakeews.configuration(self.server, USERNAME, 'wrong'),
+                                             logging.getLogger('test'))
+        with self.assertRaises(exchange2org.exchangelib.errors.UnauthorizedError):
+            exchange.dump_calendar(startday=[2026, 1, 1], endday=[2026, 2, 1],
+                                   outputfilename=os.path.join(self.directory, 'unauthorized.org'))
+
+    def test_debounce(self):
+        regenerations = self.server.count('FindItem')
+        # The changes are reported by different notifications within --debounce seconds:
+        for number, event in enumerate(self.events[:3]):
+            if number:
+                time.sleep(0.5)
+            self.server.modify(event, subject='Debounced ' + str(number))
+
+        self.assertTrue(wait_for(lambda: all('Debounced ' + str(number) in self.output() for number in range(3))))
+        self.assertEqual(self.server.count('FindItem') - regenerations, 1)
+
+    def test_retry_after_server_busy(self):
+        self.server.fail_next('FindItem', 'ErrorServerBusy')
+        with self.assertLogs(level='ERROR') as logs:
+            self.server.modify(self.events[3], subject='Changed while the server was busy')
+            self.assertTrue(wait_for(lambda: 'Changed while the server was busy' in self.output()))
+
+        self.assertIn('FindItem: ErrorServerBusy', self.server.errors)
+        self.assertTrue(any('could not write' in line for line in logs.output))
+
+    def test_reconnect(self):
+        subscriptions = self.server.count('Subscribe')
+        with self.assertLogs(level='WARNING') as logs:
+            self.server.drop_next('GetEvents')
+            self.assertTrue(wait_for(lambda: self.server.count('Subscribe') > subscriptions))
+        self.assertIn('GetEvents: dropped', self.server.errors)
+        self.assertTrue(any('lost subscription' in line for line in logs.output))
+
+        # Changes are reported by the new subscription:
+        self.server.modify(self.events[4], subject='Changed after reconnecting')
+        self.assertTrue(wait_for(lambda: 'Changed after reconnecting' in self.output()))
+
+
+if __name__ == '__main__':
+    unittest.main()